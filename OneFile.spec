@@ -3,6 +3,7 @@ from PyInstaller.utils.hooks import collect_dynamic_libs
 
 binaries = []
 binaries += collect_dynamic_libs('vgamepad')
+binaries += collect_dynamic_libs('tesserocr')
 
 
 a = Analysis(
@@ -10,7 +11,7 @@ a = Analysis(
     pathex=[],
     binaries=binaries,
     datas=[],
-    hiddenimports=[],
+    hiddenimports=['tesserocr'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
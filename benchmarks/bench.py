@@ -0,0 +1,242 @@
+"""Benchmarks of the matching and OCR hot paths
+
+Usage:
+    python benchmarks/bench.py [--save baseline.json] [--compare baseline.json] [--only matching,ocr]
+"""
+import argparse
+import json
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+from fixtures import frame_pixels, load_game_data, noisy, render_pages
+
+from logic.game_data import GameData
+from utils.backends import CaptureBackend, WindowBackend
+from utils.glyph_ocr import GlyphRecognizer
+from utils.ocr import get_achievement_names, image_to_string
+from utils.ocr_engine import OCR_ENGINES
+from utils.ocr_preprocess import preprocess_for_ocr
+from utils.screenshot import Frame, Screenshot
+from utils.status_classifier import StatusClassifier
+
+REGRESSION_THRESHOLD = 0.1  # Slowdown reported as a regression when comparing with a baseline
+
+
+class _FixtureWindow(WindowBackend):
+    def __init__(self, width: int, height: int) -> None:
+        self._size = (width, height)
+
+    def find_game(self) -> bool:
+        return True
+
+    def client_size(self) -> tuple[int, int]:
+        return self._size
+
+    def client_origin(self) -> tuple[int, int]:
+        return 0, 0
+
+    def bring_to_foreground(self, cmd_show: int = 5) -> None:
+        pass
+
+    def is_foreground(self) -> bool:
+        return True
+
+
+class _FixtureCapture(CaptureBackend):
+    def __init__(self, pages: list) -> None:
+        self._pages = pages
+        self._next = 0
+
+    def grab(self, bbox: tuple[int, int, int, int]):
+        img = self._pages[self._next % len(self._pages)][0]
+        self._next += 1
+        return img.crop(bbox)
+
+
+def _timings(samples: list[float], unit_count: int = 1) -> dict:
+    per_unit = sorted(s * 1000 / unit_count for s in samples)
+    return {
+        "median_ms": statistics.median(per_unit),
+        "p95_ms": per_unit[min(len(per_unit) - 1, int(len(per_unit) * 0.95))],
+        "samples": len(per_unit),
+    }
+
+
+def bench_matching(game_data: GameData, by_tab: bool = False, rounds: int = 2000) -> dict:
+    """Time GameData.closest_title on noisy titles, searching every title or the titles of their tab"""
+    rng = random.Random(0)
+    chives = list(game_data.data.values())
+    samples, correct = [], 0
+    for _ in range(rounds):
+        chive = rng.choice(chives)
+        query = noisy(chive["title"], rng)
+        tab = game_data.tab_of_series.get(chive.get("series"), 0) if by_tab else 0
+        start = time.perf_counter()
+        _, name, _ = game_data.closest_title(query, tab=tab)
+        samples.append(time.perf_counter() - start)
+        correct += name == chive["title"]
+    return {**_timings(samples), "accuracy": correct / rounds}
+
+
+def bench_preprocessing(rounds: int = 30) -> dict:
+    """Time the capture, resize and crop of a 1440p frame, and the OCR preprocessing of its names"""
+    pages = render_pages(4, 2560, 1440)
+    screenshot = Screenshot(_FixtureWindow(2560, 1440), _FixtureCapture(pages))
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        frame = screenshot.capture_frame()
+        for row in range(5):
+            frame.name(row), frame.desc(row), frame.completed(row)
+            preprocess_for_ocr(frame.name(row))
+        samples.append(time.perf_counter() - start)
+    return _timings(samples, 15)
+
+
+def bench_ocr(game_data: GameData, engine: str, rounds: int = 8) -> dict:
+    """Time the preprocessing and OCR of the five name crops of a page in one batch, and the accuracy of the matches"""
+    frames = [(Frame(frame_pixels(img)), ids) for img, ids in render_pages(4)]
+    samples, correct = [], 0
+    for i in range(rounds):
+        frame, ids = frames[i % len(frames)]
+        start = time.perf_counter()
+        names = get_achievement_names(list(range(5)), frame, method=engine)
+        samples.append(time.perf_counter() - start)
+        for name, c_id in zip(names, ids):
+            correct += game_data.closest_title(name)[1] == game_data.data[str(c_id)]["title"]
+    result = _timings(samples, 5)
+    result["crops_per_s"] = 1000 / result["median_ms"]
+    result["accuracy"] = correct / (rounds * 5)
+    return result
+
+
+def bench_glyphs(game_data: GameData, learn_pages: int = 30, rounds: int = 20) -> dict:
+    """Time the glyph recognizer on name crops, with an atlas learned from other pages
+
+    The accuracy is the share of crops matched to the right title, the fallback rate the share left to the OCR.
+    """
+    pages = [(Frame(frame_pixels(img)), ids) for img, ids in render_pages(learn_pages + rounds)]
+    glyphs = GlyphRecognizer()
+    for frame, ids in pages[:learn_pages]:
+        for row, c_id in enumerate(ids):
+            glyphs.learn(frame.name(row), game_data.data[str(c_id)]["title"])
+    samples, correct, fallbacks = [], 0, 0
+    for frame, ids in pages[learn_pages:]:
+        for row, c_id in enumerate(ids):
+            start = time.perf_counter()
+            text = glyphs.read(frame.name(row))
+            samples.append(time.perf_counter() - start)
+            if text is None:
+                fallbacks += 1
+            else:
+                correct += game_data.closest_title(text)[1] == game_data.data[str(c_id)]["title"]
+    return {**_timings(samples), "accuracy": correct / len(samples), "fallback_rate": fallbacks / len(samples)}
+
+
+def bench_page(game_data: GameData, engine: str | None, rounds: int = 10) -> dict:
+    """Time a whole page: capture, status classification, then OCR and matching of the five rows
+
+    Without an OCR engine, the rows are read as noisy versions of their titles.
+    """
+    pages = render_pages(rounds)
+    screenshot = Screenshot(_FixtureWindow(1920, 1080), _FixtureCapture(pages))
+    classifier = StatusClassifier()
+    rng = random.Random(0)
+    samples = []
+    for _, ids in pages:
+        start = time.perf_counter()
+        frame = screenshot.capture_frame()
+        classifier.classify_page(frame)
+        if engine is None:
+            names = [noisy(game_data.data[str(c_id)]["title"], rng) for c_id in ids]
+        else:
+            names = get_achievement_names(list(range(len(ids))), frame, method=engine)
+        for name in names:
+            game_data.closest_title(name)
+        samples.append(time.perf_counter() - start)
+    result = _timings(samples)
+    result["pages_per_s"] = 1000 / result["median_ms"]
+    return result
+
+
+def run(only: set[str] | None = None) -> dict:
+    game_data = GameData(load_game_data())
+    results: dict[str, dict] = {}
+
+    def wanted(name: str) -> bool:
+        return only is None or name.split(":")[0] in only
+
+    if wanted("matching"):
+        results["matching"] = bench_matching(game_data)
+        results["matching:tab"] = bench_matching(game_data, by_tab=True)
+    if wanted("preprocessing"):
+        results["preprocessing"] = bench_preprocessing()
+    if wanted("glyphs"):
+        results["glyphs"] = bench_glyphs(game_data)
+    available = []
+    for engine, engine_class in OCR_ENGINES.items():
+        if not wanted("ocr") and not wanted("page"):
+            break
+        if not engine_class.available():
+            print(f"Skipping OCR engine {engine}: not installed", file=sys.stderr)
+            continue
+        try:
+            image_to_string(Frame(frame_pixels(render_pages(1)[0][0])).name(0), method=engine)
+            available.append(engine)
+        except Exception as e:
+            print(f"Skipping OCR engine {engine}: {e.__class__.__name__}: {e}", file=sys.stderr)
+    for engine in available:
+        if wanted("ocr"):
+            results[f"ocr:{engine}"] = bench_ocr(game_data, engine)
+    if wanted("page"):
+        results["page:no-ocr"] = bench_page(game_data, None)
+        for engine in available:
+            results[f"page:{engine}"] = bench_page(game_data, engine)
+    return results
+
+
+def _commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--save", help="Save the results as a baseline")
+    parser.add_argument("--compare", help="Compare the results with a baseline")
+    parser.add_argument("--only", help="Comma separated benchmarks to run: matching, preprocessing, glyphs, ocr, page")
+    args = parser.parse_args()
+
+    results = run(set(args.only.split(",")) if args.only else None)
+    regressions = 0
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)["results"]
+    for name, result in results.items():
+        line = f"{name:<20} median {result['median_ms']:9.3f} ms   p95 {result['p95_ms']:9.3f} ms"
+        extra = {k: v for k, v in result.items() if k not in ("median_ms", "p95_ms", "samples")}
+        line += "".join(f"   {k} {v:.3f}" for k, v in extra.items())
+        if name in baseline:
+            change = result["median_ms"] / baseline[name]["median_ms"] - 1
+            line += f"   {change:+.1%} vs baseline"
+            if change > REGRESSION_THRESHOLD:
+                line += "  REGRESSION"
+                regressions += 1
+        print(line)
+
+    if args.save:
+        with open(args.save, "w") as baseline_file:
+            json.dump({"commit": _commit(), "python": sys.version.split()[0], "results": results},
+                      baseline_file, indent=4)
+        print("Saved baseline to " + args.save)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
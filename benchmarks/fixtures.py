@@ -0,0 +1,124 @@
+"""Fixed fixtures for the benchmarks: a synthetic game data file and rendered achievement rows"""
+import json
+import os
+import random
+import sys
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCHMARKS_DIR), "src"))
+
+from utils.screenshot import REFERENCE_HEIGHT, REFERENCE_WIDTH, compute_rois  # noqa: E402
+
+GAME_DATA_FIXTURE = os.path.join(BENCHMARKS_DIR, "fixtures", "game_data.json")
+FIXTURE_SEED = 1337
+FIXTURE_SIZE = 1200
+TABS = 9
+
+_WORDS = (
+    "the a of to in trail blazer star rail express herta space station jarilo belobog xianzhou luofu penacony "
+    "dream memory aeon stellaron hunter simulated universe forgotten hall echo war trotter warp tickets "
+    "credits relic light cone path nihility destruction harmony abundance erudition preservation hunt "
+    "elation remembrance enigmata fortune garbage bin treasure chest golden moment dust unyielding glory "
+    "odyssey fathom unfathomable vientiane eco rail unto moment joy lost return never again one more time"
+).split()
+
+
+def generate_game_data() -> dict:
+    """Generate the synthetic game data, with the same fields as the real one
+
+    :return: The game data
+    """
+    rng = random.Random(FIXTURE_SEED)
+    data = {}
+    for i in range(FIXTURE_SIZE):
+        series = 1 + i * TABS // FIXTURE_SIZE
+        title = " ".join(rng.choice(_WORDS) for _ in range(rng.randint(1, 6))).title()
+        if i % 97 == 0 and data:  # Titles shared by several achievements
+            title = data[rng.choice(list(data))]["title"]
+        desc = " ".join(rng.choice(_WORDS) for _ in range(rng.randint(6, 16))).capitalize() + "."
+        data[str(4000000 + series * 1000 + i)] = {"title": title, "desc": desc, "series": series}
+    return data
+
+
+def load_game_data() -> dict:
+    """:return: The game data fixture"""
+    with open(GAME_DATA_FIXTURE) as fixture_file:
+        return json.load(fixture_file)
+
+
+def noisy(text: str, rng: random.Random, errors: int = 2) -> str:
+    """Simulate OCR errors on a string
+
+    :param text: The original string
+    :param rng: The random generator
+    :param errors: The maximum number of substituted characters
+    :return: The altered string
+    """
+    chars = list(text)
+    for _ in range(rng.randint(0, errors)):
+        chars[rng.randrange(len(chars))] = rng.choice("abcdefghijklmnopqrstuvwxyz ")
+    return "".join(chars)
+
+
+def _font() -> ImageFont.ImageFont:
+    try:
+        return ImageFont.load_default(size=28)
+    except TypeError:  # Pillow without FreeType
+        return ImageFont.load_default()
+
+
+def render_page(rows: list[dict], width: int = REFERENCE_WIDTH, height: int = REFERENCE_HEIGHT) -> Image.Image:
+    """Render a page of the achievement list, with the titles and descriptions at the row positions
+
+    :param rows: The achievements of the five visible rows
+    :param width: The width of the rendered frame
+    :param height: The height of the rendered frame
+    :return: The rendered frame
+    """
+    img = Image.new("RGB", (REFERENCE_WIDTH, REFERENCE_HEIGHT), (38, 38, 46))
+    draw = ImageDraw.Draw(img)
+    font = _font()
+    rois = compute_rois(REFERENCE_WIDTH, REFERENCE_HEIGHT)
+    for row, chive in enumerate(rows[:5]):
+        left, top, _, _ = rois["name"][row]
+        draw.text((left + 4, top + 4), chive["title"], fill=(230, 230, 230), font=font)
+        left, top, _, _ = rois["desc"][row]
+        draw.text((left + 4, top + 4), chive["desc"], fill=(170, 170, 170), font=font)
+        left, top, _, _ = rois["completed"][row]
+        draw.text((left + 10, top + 4), "Completed", fill=(200, 200, 200), font=font)
+    if (width, height) != (REFERENCE_WIDTH, REFERENCE_HEIGHT):
+        img = img.resize((width, height))
+    return img
+
+
+def render_pages(count: int, width: int = REFERENCE_WIDTH, height: int = REFERENCE_HEIGHT
+                 ) -> list[tuple[Image.Image, list[int]]]:
+    """Render consecutive pages of the achievement list
+
+    :param count: The number of pages
+    :param width: The width of the rendered frames
+    :param height: The height of the rendered frames
+    :return: The frames, with the IDs of their rows
+    """
+    data = load_game_data()
+    ids = list(data.keys())
+    pages = []
+    for page in range(count):
+        page_ids = ids[page * 5:page * 5 + 5]
+        pages.append((render_page([data[c_id] for c_id in page_ids], width, height), [int(c) for c in page_ids]))
+    return pages
+
+
+def frame_pixels(img: Image.Image) -> np.ndarray:
+    """:return: The RGB pixels of a rendered frame"""
+    return np.asarray(img.convert("RGB"))
+
+
+if __name__ == "__main__":
+    os.makedirs(os.path.dirname(GAME_DATA_FIXTURE), exist_ok=True)
+    with open(GAME_DATA_FIXTURE, "w") as fixture_file:
+        json.dump(generate_game_data(), fixture_file, indent=1, ensure_ascii=False)
+    print("Wrote " + GAME_DATA_FIXTURE)
@@ -0,0 +1,175 @@
+"""Command line scanner, for scheduled and scripted scans without the UI
+
+Progress is written to stdout as JSON lines, one object per event with an "event" key:
+ready, log, progress, result, upload, interrupted or error.
+
+Usage:
+    python cli.py [--output DIR] [--workers N] [--record session.zip | --replay session.zip] [--stardb-cookie COOKIE]
+"""
+import argparse
+import json
+import os
+import signal
+import sys
+import time
+
+from logic.listener import ScanListener
+
+_START = time.perf_counter()
+
+EXIT_ERROR = 1
+EXIT_INTERRUPTED = 130
+
+
+def emit(event: str, **values) -> None:
+    """Write an event to stdout as a JSON line
+
+    :param event: The event type
+    :param values: The event values
+    """
+    print(json.dumps({"event": event, **values}), flush=True)
+
+
+class JsonScanListener(ScanListener):
+    """Writes the logs and progress of the scan as log and progress events"""
+
+    def log(self, message: str) -> None:
+        emit("log", message=message)
+
+    def progress(self, tab: int) -> None:
+        emit("progress", tab=tab)
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    """Parse the command line
+
+    :param argv: The arguments, sys.argv if None
+    :return: The parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="Scan the Honkai: Star Rail achievements without the UI")
+    parser.add_argument("--output", help="Output location, defaults to the one of the UI")
+    parser.add_argument("--method", default="tesseract", choices=["tesseract", "easyocr", "doctr"], help="OCR method")
+    parser.add_argument("--lang", default="en", choices=["en"], help="Language of the game")
+    parser.add_argument("--nav-delay", type=int, default=0, help="Extra delay after each navigation, in ms")
+    parser.add_argument("--scan-delay", type=int, default=0, help="Extra delay before each capture, in ms")
+    parser.add_argument(
+        "--workers", type=int, default=1,
+        help="OCR worker processes, the scan is pipelined above 1, 0 for one per core but one kept for navigation",
+    )
+    parser.add_argument(
+        "--delta", action="store_true", help="Finish tabs early from the last result and the size of each tab"
+    )
+    parser.add_argument("--no-resume", action="store_true", help="Start over even if the last scan did not finish")
+    parser.add_argument("--no-cache", action="store_true", help="Do not reuse the rows matched in previous scans")
+    parser.add_argument("--debug", action="store_true", help="Save screenshots")
+    parser.add_argument("--timings", action="store_true", help="Report the time spent in each stage of the scan")
+    parser.add_argument("--record", metavar="SESSION", help="Record the session to a zip file, to replay it later")
+    parser.add_argument("--replay", metavar="SESSION", help="Replay a recorded session instead of the live game")
+    parser.add_argument("--game-data", metavar="FILE", help="Read the game data from a JSON file")
+    parser.add_argument(
+        "--stardb-cookie", default=os.environ.get("STARDB_COOKIE"),
+        help="Upload the result to stardb.gg with this id cookie, defaults to $STARDB_COOKIE",
+    )
+    return parser.parse_args(argv)
+
+
+def build_config(args: argparse.Namespace, output_location: str) -> dict:
+    """Build the scan configuration, with the same defaults as the UI
+
+    :param args: The parsed arguments
+    :param output_location: The output location
+    :return: The configuration for the scan
+    """
+    from logic.pipeline import default_workers
+    from utils.data import create_debug_folder, find_latest_scan
+    from utils.journal import JOURNAL_FILE
+
+    config = {
+        "nav_delay": args.nav_delay / 1000,
+        "scan_delay": args.scan_delay / 1000,
+        "workers": args.workers or default_workers(),
+        "cache_location": "" if args.no_cache else os.path.join(output_location, "cache"),
+        "timings": args.timings,
+        "previous_scan": find_latest_scan(output_location) if args.delta else None,
+        "journal": os.path.join(output_location, JOURNAL_FILE),
+        "flight_recorder_location": output_location,
+        "debug": args.debug,
+        "debug_output_location": "",
+    }
+    config["resume"] = not args.no_resume and os.path.exists(config["journal"])
+    if args.debug:
+        config["debug_output_location"] = create_debug_folder(output_location)
+    if args.record and not args.replay:
+        config["record_session"] = args.record
+    return config
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run a scan
+
+    :param argv: The arguments, sys.argv if None
+    :return: The exit code
+    """
+    args = parse_args(argv)
+
+    import asyncio
+
+    try:
+        # Imported once the arguments are valid, so --help and usage errors stay instant
+        from logic.game_data import GameData, load_game_data
+        from logic.scanner import HSRScanner
+        from utils.data import executable_path, get_json_data, save_scan_result
+    except ImportError as e:
+        emit("error", message=f"Missing dependency: {e}")
+        return EXIT_ERROR
+
+    output_location = args.output or executable_path("StarRailData")
+
+    try:
+        if args.game_data:
+            game_data = GameData(get_json_data(args.game_data))
+        else:
+            game_data = load_game_data(os.path.join(output_location, "cache"))
+        backends = None
+        if args.replay:
+            from utils.session import ReplaySession
+
+            backends = ReplaySession(args.replay).backends
+        scanner = HSRScanner(
+            build_config(args, output_location), game_data, method=args.method, lang=args.lang, backends=backends,
+            listener=JsonScanListener(),
+        )
+    except Exception as e:
+        emit("error", message=str(e))
+        return EXIT_ERROR
+    signal.signal(signal.SIGINT, lambda *_: scanner.stop_scan())
+    emit("ready", startup_ms=round((time.perf_counter() - _START) * 1000, 1))
+
+    try:
+        result = asyncio.run(scanner.start_scan())
+    except Exception as e:
+        emit("error", message=f"Scan aborted with error {e.__class__.__name__}: {e}")
+        return EXIT_ERROR
+    if scanner.interrupted:
+        emit("interrupted", found=len(result["achievements"]))
+        return EXIT_INTERRUPTED
+
+    file_name = save_scan_result(result, output_location)
+    emit("result", file=os.path.join(output_location, file_name), count=len(result["achievements"]))
+    if args.stardb_cookie:
+        from utils.stardb import StarDBClient
+
+        try:
+            with StarDBClient(args.stardb_cookie) as client:
+                emit("upload", count=len(client.upload(result["achievements"])))
+        except Exception as e:
+            emit("error", message=f"Upload to stardb.gg failed: {e}")
+            return EXIT_ERROR
+    return 0
+
+
+if __name__ == "__main__":
+    import multiprocessing
+
+    multiprocessing.freeze_support()
+    sys.exit(main())
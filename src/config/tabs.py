@@ -0,0 +1,3 @@
+# Tab of the achievement menu listing each series of the game data, the tabs being numbered from 1 in menu order.
+# The achievements are only searched per tab if the game data has exactly these series.
+SERIES_TABS = {1: 1, 2: 2, 3: 3, 4: 4, 5: 5, 6: 6, 7: 7, 8: 8, 9: 9}
@@ -0,0 +1,46 @@
+from logic.game_data import GameData
+
+
+class DeltaScan:
+    """Uses the previous scan result and the size of each tab to finish tabs early
+
+    A tab lists the claimable achievements first, then the uncompleted ones, then the claimed ones. Once the
+    scanner reaches the claimed section, if its size matches the achievements already completed in the previous
+    scan that were not seen yet, the rest of the tab is known without scrolling through it.
+    """
+
+    def __init__(self, game_data: GameData, previous_completed: list[int]) -> None:
+        """Constructor
+
+        :param game_data: The GameData class instance
+        :param previous_completed: The IDs of the achievements completed in the previous scan
+        """
+        self._tabs = game_data.tabs
+        self._previous = set(previous_completed)
+
+    def tab_total(self, tab: int) -> int:
+        """:return: The number of achievements in a tab"""
+        return len(self._tabs.get(tab, ()))
+
+    def is_tab_exhausted(self, tab: int, rows_seen: int) -> bool:
+        """Check if every row of a tab was seen
+
+        :param tab: The tab
+        :param rows_seen: The number of rows of the tab seen so far
+        :return: Whether the last row of the tab was seen
+        """
+        return 0 < self.tab_total(tab) <= rows_seen
+
+    def known_rest_of_tab(self, tab: int, rows_seen: int, seen: set[int]) -> list[int] | None:
+        """Get the rest of the claimed section of a tab from the previous scan
+
+        :param tab: The tab, whose claimed section has been reached
+        :param rows_seen: The number of rows of the tab seen so far
+        :param seen: The IDs of the achievements of the tab seen so far
+        :return: The IDs of the remaining rows, or None if they can't all be known from the previous scan
+        """
+        remaining = self.tab_total(tab) - rows_seen
+        if remaining <= 0:
+            return None
+        known = [c_id for c_id in self._tabs[tab] if c_id in self._previous and c_id not in seen]
+        return known if len(known) == remaining else None
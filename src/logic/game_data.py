@@ -1,54 +1,377 @@
+import hashlib
+import json
+import os
+import pickle
+import sys
+
 import Levenshtein
 import requests
 
-from utils.screenshot import Screenshot
+from config.tabs import SERIES_TABS
+from utils.ngram_index import NGramIndex
+from utils.glyph_ocr import GlyphRecognizer
+from utils.screenshot import Frame
 from utils.ocr import get_achievement_name, get_achievement_desc, ratio
+from utils.timing import timings
 
 GAME_DATA_URL = "https://github.com/hashblen/HSRAchievementData/raw/main/output/achievement_processed_data.json"
 
+GAME_DATA_SNAPSHOT_FILE = "game_data.pickle"
+GAME_DATA_SNAPSHOT_FORMAT = 5  # Bump when the precomputed GameData attributes change
+GAME_DATA_TIMEOUT = 10
+
+NAME_MATCH_CANDIDATES = 32  # Number of titles re-ranked with ratio() after the n-gram lookup
+NAME_MATCH_CONFIDENCE = 0.8  # Below this score, the candidates might have missed the best title so scan everything
+
+PREDICTION_WINDOW = 8  # Number of achievements following the previous match that are tried first
+PREDICTION_CONFIDENCE = 0.9  # Minimum score of a predicted achievement to skip the search
+PREDICTION_MARGIN = 0.15  # Minimum lead of the best predicted title over the other predicted titles
+
+
+class _TitleIndex:
+    """The titles of a group of achievements, with their n-gram index"""
+
+    def __init__(self, ids: list[int], ids_by_title: dict[str, list[int]]) -> None:
+        """Constructor
+
+        :param ids: The IDs of the achievements, in data order
+        :param ids_by_title: The IDs of the achievements per title
+        """
+        self.ids = ids
+        self.ids_by_title = ids_by_title
+        self.titles: list[str] = list(ids_by_title.keys())
+        self.ngram_index = NGramIndex(self.titles)
+
 
 class GameData:
     """GameData class for storing and accessing game data"""
 
-    def __init__(self) -> None:
-        try:
-            response = requests.get(GAME_DATA_URL)
-            data = response.json()
-        except requests.exceptions.RequestException:
-            raise Exception("Failed to fetch game data from " + GAME_DATA_URL)
+    last_read: tuple[str, str] = ("", "")  # Name and description read by the last match_name call, for diagnostics
+
+    def __init__(self, data: dict | None = None) -> None:
+        """Constructor
+
+        :param data: The game data, fetched from GAME_DATA_URL if None
+        :raises Exception: Thrown if the game data could not be fetched
+        """
+        if data is None:
+            try:
+                response = requests.get(GAME_DATA_URL)
+                data = response.json()
+            except requests.exceptions.RequestException:
+                raise Exception("Failed to fetch game data from " + GAME_DATA_URL)
 
         # self.version = data["version"]
+        self.version = hashlib.sha1(json.dumps(data, sort_keys=True).encode()).hexdigest()[:12]
         self.data = data
+        self._build_name_index()
+        self._build_tabs()
 
-    def get_closest_name_match(self, index: int, screenshotter: Screenshot, lang="en") -> tuple[str, int]:
-        """Get closest match from name
+    def _build_name_index(self) -> None:
+        """Build the n-gram index over the achievement titles and the groups of achievements sharing a title"""
+        ids_by_title: dict[str, list[int]] = {}
+        for c_id_str, chive in self.data.items():
+            chive["title"] = sys.intern(chive["title"])
+            ids_by_title.setdefault(chive["title"], []).append(int(c_id_str))
+        self._order: dict[int, int] = {int(c_id_str): i for i, c_id_str in enumerate(self.data.keys())}
+        self._names = _TitleIndex(list(self._order.keys()), ids_by_title)
+        self.duplicate_groups: dict[str, list[int]] = {
+            title: ids for title, ids in ids_by_title.items() if len(ids) > 1
+        }
 
-        :param index: The index of the achievement to get the closest match from
-        :param screenshotter: The screenshotter to use
-        :param lang: language code
-        :return: The closest match name and ID
+    def _build_tabs(self) -> None:
+        """Group the achievements by the tab of the achievement menu listing their series, and index each tab
+
+        The achievements are not grouped if the series of the data are not the ones of SERIES_TABS, as they
+        would be searched on the wrong tab.
+        """
+        series_ids = {chive["series"] for chive in self.data.values() if chive.get("series") is not None}
+        self.tab_of_series: dict[int, int] = dict(SERIES_TABS) if series_ids == set(SERIES_TABS) else {}
+        self.tabs: dict[int, list[int]] = {}
+        for c_id_str, chive in self.data.items():
+            if chive.get("series") in self.tab_of_series:
+                self.tabs.setdefault(self.tab_of_series[chive["series"]], []).append(int(c_id_str))
+        self._tab_position: dict[int, int] = {c_id: i for ids in self.tabs.values() for i, c_id in enumerate(ids)}
+        self._tab_of_id: dict[int, int] = {c_id: tab for tab, ids in self.tabs.items() for c_id in ids}
+        self._tab_names: dict[int, _TitleIndex] = {}
+        for tab, ids in self.tabs.items():
+            ids_by_title: dict[str, list[int]] = {}
+            for c_id in ids:
+                ids_by_title.setdefault(self.data[str(c_id)]["title"], []).append(c_id)
+            self._tab_names[tab] = _TitleIndex(ids, ids_by_title)
+
+    def predicted_ids(self, tab: int, previous_id: int, lookahead: int = PREDICTION_WINDOW) -> list[int]:
+        """Get the achievements expected after a row, as a tab lists its achievements in series order
+
+        :param tab: The tab the rows are on
+        :param previous_id: The ID of the previous matched row of the tab
+        :param lookahead: The number of achievements to return
+        :return: The IDs of the achievements following the previous one in the tab, empty if it is not in the tab
+        """
+        ids = self.tabs.get(tab)
+        position = self._tab_position.get(previous_id)
+        if ids is None or position is None or ids[position] != previous_id:
+            return []
+        return ids[position + 1:position + 1 + lookahead]
+
+    def _name_candidates(self, name_from_image: str, names: _TitleIndex) -> list[int]:
+        """Get the IDs of the achievements whose title is close to the name, in data order
+
+        :param name_from_image: The name read from the screen
+        :param names: The titles to look up
+        :return: The candidate IDs
+        """
+        candidates: list[int] = []
+        for title_key in names.ngram_index.candidates(name_from_image, NAME_MATCH_CANDIDATES):
+            candidates.extend(names.ids_by_title[names.titles[title_key]])
+        return sorted(candidates, key=self._order.__getitem__)
+
+    def _search(self, name_from_image: str, names: _TitleIndex) -> tuple[float, str, int]:
+        """Find the best match for the name among indexed titles
+
+        The titles sharing the most trigrams with the name are re-ranked with ratio(),
+        every title is only compared if none of them is a confident match.
+
+        :param name_from_image: The name read from the screen
+        :param names: The titles to search
+        :return: The best score, name and ID
+        """
+        max_cost, max_name, max_id = self._rank(name_from_image, self._name_candidates(name_from_image, names))
+        if max_cost < NAME_MATCH_CONFIDENCE:
+            max_cost, max_name, max_id = self._rank(name_from_image, names.ids)
+        return max_cost, max_name, max_id
+
+    def _rank(self, name_from_image: str, ids: list[int]) -> tuple[float, str, int]:
+        """Find the best match for the name among the given achievements
+
+        :param name_from_image: The name read from the screen
+        :param ids: The IDs of the achievements to compare against, in data order
+        :return: The best score, name and ID
         """
-        name_from_image: str = get_achievement_name(index, screenshotter, lang=lang)
         max_cost: float = 0.
         max_name: str = ""
         max_id: int = -1
-        for c_id_str in self.data.keys():
-            c_id: int = int(c_id_str)
-            chive_name = self.data[c_id_str]["title"]
+        for c_id in ids:
+            chive_name = self.data[str(c_id)]["title"]
             cost = ratio(name_from_image, chive_name)
-            if max_name == chive_name:  # If the max and the current achievements have the same name, look at desc.
-                desc_from_image = get_achievement_desc(index, screenshotter, lang=lang)
-                desc_cost = ratio(desc_from_image, self.data[c_id_str]["desc"])
-                max_desc_cost = ratio(desc_from_image, self.data[str(max_id)]["desc"])
-                if desc_cost > max_desc_cost:
-                    max_cost = cost
-                    max_name = chive_name
-                    max_id = c_id
-                    continue
             if cost > max_cost:
                 max_cost = cost
                 max_name = chive_name
                 max_id = c_id
-        if max_cost < 0.5:
-            raise ValueError("No close match")
+        return max_cost, max_name, max_id
+
+    def _predict(self, name_from_image: str, ids: list[int], names: _TitleIndex) -> tuple[float, str, int] | None:
+        """Find a clear match for the name among the predicted achievements
+
+        Rows leave the data order at every status section boundary, so the best predicted title must also beat the
+        closest titles outside of the prediction.
+
+        :param name_from_image: The name read from the screen
+        :param ids: The predicted IDs, in tab order
+        :param names: The titles the prediction is checked against
+        :return: The score, name and ID of the match, or None if no predicted title is clearly the best
+        """
+        scores: dict[str, tuple[float, int]] = {}
+        for c_id in ids:
+            chive_name = self.data[str(c_id)]["title"]
+            if chive_name not in scores:
+                scores[chive_name] = (ratio(name_from_image, chive_name), c_id)
+        ranked = sorted(scores.items(), key=lambda item: item[1][0], reverse=True)
+        if not ranked:
+            return None
+        best_name, (best_cost, best_id) = ranked[0]
+        runner_up = ranked[1][1][0] if len(ranked) > 1 else 0.
+        if best_cost < PREDICTION_CONFIDENCE or best_cost - runner_up < PREDICTION_MARGIN:
+            return None
+        rival_cost, _, _ = self._rank(name_from_image, self._name_candidates(name_from_image, names))
+        if rival_cost > best_cost:
+            return None
+        return best_cost, best_name, best_id
+
+    def _resolve_duplicate(self, name: str, desc_from_image: str, tab: int = 0) -> int:
+        """Pick the achievement with the closest description among the ones sharing a title
+
+        :param name: The shared title
+        :param desc_from_image: The description read from the screen
+        :param tab: The tab the achievement is on, the achievements of other tabs are ignored if some are on it
+        :return: The ID of the closest achievement
+        """
+        group = self.duplicate_groups[name]
+        group = [c_id for c_id in group if self._tab_of_id.get(c_id) == tab] or group
+        max_desc_cost: float = -1.
+        max_id: int = -1
+        for c_id in group:
+            desc_cost = ratio(desc_from_image, self.data[str(c_id)]["desc"])
+            if desc_cost > max_desc_cost:
+                max_desc_cost = desc_cost
+                max_id = c_id
+        return max_id
+
+    def closest_title(self, name_from_image: str, predicted: list[int] | None = None,
+                      tab: int = 0) -> tuple[float, str, int]:
+        """Find the title closest to a name read from the screen
+
+        The predicted achievements are tried first, and kept if no title of the tab close to the name is a better
+        match. Then the titles of the tab are searched. Every title is only searched if none of them is a confident
+        match.
+
+        :param name_from_image: The name read from the screen
+        :param predicted: The IDs of the achievements expected on this row
+        :param tab: The tab the achievement is on, 0 if unknown
+        :return: The best score, name and ID
+        """
+        if predicted:
+            with timings.span("match.predicted"):
+                prediction = self._predict(name_from_image, predicted, self._tab_names.get(tab, self._names))
+            if prediction is not None:
+                return prediction
+        if tab in self._tab_names:
+            with timings.span("match.tab"):
+                max_cost, max_name, max_id = self._search(name_from_image, self._tab_names[tab])
+            if max_cost >= NAME_MATCH_CONFIDENCE:
+                return max_cost, max_name, max_id
+        with timings.span("match.fuzzy"):
+            return self._search(name_from_image, self._names)
+
+    def get_closest_name_match(self, index: int, frame: Frame, lang="en", tab: int = 0) -> tuple[str, int]:
+        """Get closest match from name
+
+        :param index: The index of the achievement to get the closest match from
+        :param frame: The frame the achievement is on
+        :param lang: language code
+        :param tab: The tab the achievement is on, used to narrow down the search
+        :return: The closest match name and ID
+        """
+        max_name, max_id, _ = self.match_name(index, frame, lang, tab)
         return max_name, max_id
+
+    def match_name(self, index: int, frame: Frame, lang="en", tab: int = 0, previous_id: int = -1,
+                   lookahead: int = PREDICTION_WINDOW, method="tesseract",
+                   glyphs: GlyphRecognizer | None = None) -> tuple[str, int, float]:
+        """Get closest match from name, with its score
+
+        The description is only read when the matched title is shared by several achievements.
+
+        :param index: The index of the achievement to get the closest match from
+        :param frame: The frame the achievement is on
+        :param lang: language code
+        :param tab: The tab the achievement is on, used to narrow down the search
+        :param previous_id: The ID of the previous matched row of the tab, -1 if unknown
+        :param lookahead: The number of achievements following the previous one to try first
+        :param method: The OCR method
+        :param glyphs: The glyph recognizer to read the name with before the OCR, if any
+        :raises ValueError: Thrown if no title is close enough
+        :return: The closest match name, ID and score
+        """
+        name_from_image: str = get_achievement_name(index, frame, method, lang, glyphs=glyphs)
+        self.last_read = (name_from_image, "")
+        predicted = self.predicted_ids(tab, previous_id, lookahead) if previous_id >= 0 else None
+        max_cost, max_name, max_id = self.closest_title(name_from_image, predicted, tab)
+        if max_cost < 0.5:
+            raise ValueError(f"No close match for {name_from_image!r}")
+        if max_name in self.duplicate_groups:
+            desc_from_image = get_achievement_desc(index, frame, method, lang)
+            self.last_read = (name_from_image, desc_from_image)
+            max_id = self._resolve_duplicate(max_name, desc_from_image, tab)
+        return max_name, max_id, max_cost
+
+
+def _load_snapshot(path: str) -> dict | None:
+    """Load the game data snapshot saved by a previous launch
+
+    An out of date snapshot format has its GameData rebuilt from the data, and is flagged as "rebuilt".
+
+    :param path: The snapshot file
+    :return: The snapshot, or None if there is no usable one
+    """
+    try:
+        with open(path, "rb") as snapshot_file:
+            snapshot = pickle.load(snapshot_file)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+    if not isinstance(snapshot, dict) or "data" not in snapshot:
+        return None
+    if snapshot.get("format") != GAME_DATA_SNAPSHOT_FORMAT:
+        snapshot["game_data"] = GameData(snapshot["data"])
+        snapshot["rebuilt"] = True
+    return snapshot
+
+
+def _snapshot_game_data(path: str, snapshot: dict) -> GameData:
+    """Get the GameData of a snapshot still up to date, saving it again if it had to be rebuilt
+
+    :param path: The snapshot file
+    :param snapshot: The snapshot
+    :return: The game data
+    """
+    if snapshot.get("rebuilt"):
+        try:
+            _save_snapshot(path, snapshot["game_data"], snapshot.get("etag"), snapshot.get("last_modified"))
+        except OSError:
+            pass
+    return snapshot["game_data"]
+
+
+def _save_snapshot(path: str, game_data: GameData, etag: str | None, last_modified: str | None) -> None:
+    """Save the game data along with its precomputed lookup structures
+
+    :param path: The snapshot file
+    :param game_data: The game data
+    :param etag: The ETag of the game data response
+    :param last_modified: The Last-Modified date of the game data response
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as snapshot_file:
+        pickle.dump(
+            {
+                "format": GAME_DATA_SNAPSHOT_FORMAT,
+                "etag": etag,
+                "last_modified": last_modified,
+                "data": game_data.data,
+                "game_data": game_data,
+            },
+            snapshot_file,
+            protocol=pickle.HIGHEST_PROTOCOL,
+        )
+    os.replace(tmp_path, path)
+
+
+def load_game_data(cache_location: str | None = None, url: str = GAME_DATA_URL) -> GameData:
+    """Load the game data, from the local snapshot when it is still up to date
+
+    The snapshot is revalidated with a conditional request, and used as is when offline.
+
+    :param cache_location: The folder the snapshot is stored in, no snapshot is used if None
+    :param url: The URL of the game data
+    :raises Exception: Thrown if the game data could not be fetched and there is no snapshot
+    :return: The game data
+    """
+    if cache_location is None:
+        return GameData()
+    path = os.path.join(cache_location, GAME_DATA_SNAPSHOT_FILE)
+    snapshot = _load_snapshot(path)
+
+    headers = {}
+    if snapshot is not None:
+        if snapshot.get("etag"):
+            headers["If-None-Match"] = snapshot["etag"]
+        if snapshot.get("last_modified"):
+            headers["If-Modified-Since"] = snapshot["last_modified"]
+    try:
+        response = requests.get(url, headers=headers, timeout=GAME_DATA_TIMEOUT)
+        if response.status_code == 304 and snapshot is not None:
+            return _snapshot_game_data(path, snapshot)
+        response.raise_for_status()
+        data = response.json()
+    except (requests.exceptions.RequestException, ValueError):
+        if snapshot is not None:
+            return _snapshot_game_data(path, snapshot)
+        raise Exception("Failed to fetch game data from " + url)
+
+    game_data = GameData(data)
+    try:
+        _save_snapshot(path, game_data, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+    except OSError:
+        pass
+    return game_data
@@ -0,0 +1,14 @@
+class ScanListener:
+    """Receives the events of a scan, in the thread the scan runs in"""
+
+    def log(self, message: str) -> None:
+        """A message for the user
+
+        :param message: The message
+        """
+
+    def progress(self, tab: int) -> None:
+        """A completed achievement was found
+
+        :param tab: The tab it is on
+        """
@@ -0,0 +1,138 @@
+import os
+import queue
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from logic.game_data import PREDICTION_WINDOW, GameData
+from utils.glyph_ocr import GlyphRecognizer
+from utils.ocr import get_completed_status
+from utils.screenshot import Frame, REFERENCE_HEIGHT, REFERENCE_WIDTH
+from utils.status_classifier import StatusClassifier
+from utils.timing import timings
+
+FRAME_SHAPE = (REFERENCE_HEIGHT, REFERENCE_WIDTH, 3)
+MAX_WORKERS = 4
+
+_worker: dict = {}
+
+
+def default_workers() -> int:
+    """:return: The number of OCR worker processes to use, keeping a core for the navigation"""
+    return min(MAX_WORKERS, max(1, (os.cpu_count() or 1) - 1))
+
+
+class FrameRing:
+    """Fixed number of frame slots in shared memory, handed to the OCR workers without pickling the pixels"""
+
+    def __init__(self, slots: int, shape: tuple[int, int, int] = FRAME_SHAPE) -> None:
+        """Constructor
+
+        :param slots: The number of frames that can be in flight at the same time
+        :param shape: The shape of a frame
+        """
+        self.shape = shape
+        self.slots = slots
+        self._shm = shared_memory.SharedMemory(create=True, size=slots * int(np.prod(shape)))
+        self._frames = np.ndarray((slots, *shape), dtype=np.uint8, buffer=self._shm.buf)
+        self._free: queue.Queue = queue.Queue()
+        for slot in range(slots):
+            self._free.put(slot)
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    def acquire(self, timeout: float | None = None) -> int:
+        """Wait for a free slot
+
+        :param timeout: The maximum time to wait, in seconds
+        :raises queue.Empty: Thrown if no slot was freed in time
+        :return: The slot
+        """
+        return self._free.get(timeout=timeout)
+
+    def write(self, slot: int, pixels: np.ndarray) -> None:
+        """Copy a frame into a slot
+
+        :param slot: The slot to write to
+        :param pixels: The pixels of the frame
+        """
+        self._frames[slot] = pixels
+
+    def release(self, slot: int) -> None:
+        """Give a slot back once its frame has been processed
+
+        :param slot: The slot to release
+        """
+        self._free.put(slot)
+
+    def close(self) -> None:
+        """Free the shared memory"""
+        del self._frames
+        self._shm.close()
+        self._shm.unlink()
+
+
+def init_worker(data: dict, method: str, lang: str, shm_name: str, slots: int, record_timings: bool = False,
+                glyph_atlas: str = "") -> None:
+    """Initialize an OCR worker process
+
+    :param data: The game data
+    :param method: The OCR method
+    :param lang: language code
+    :param shm_name: The name of the shared memory of the FrameRing
+    :param slots: The number of slots of the FrameRing
+    :param record_timings: Whether to time the stages, the durations are sent back with each result
+    :param glyph_atlas: The glyph atlas learned by the previous scans, the names are only read with OCR if empty
+    """
+    timings.reset(record_timings)
+    shm = shared_memory.SharedMemory(name=shm_name)
+    _worker["shm"] = shm
+    _worker["frames"] = np.ndarray((slots, *FRAME_SHAPE), dtype=np.uint8, buffer=shm.buf)
+    _worker["game_data"] = GameData(data)
+    _worker["classifier"] = StatusClassifier()
+    _worker["glyphs"] = GlyphRecognizer(glyph_atlas, lang) if glyph_atlas else None
+    _worker["method"] = method
+    _worker["lang"] = lang
+
+
+def process_frame(
+        slot: int, index: int, tab: int, check_status: bool, known_id: int = -1, previous_id: int = -1,
+        lookahead: int = PREDICTION_WINDOW,
+) -> tuple[bool, bool, str, int, float, tuple[str, str], dict[str, list[float]]]:
+    """Read the completed status of a row and match its name, in an OCR worker process
+
+    :param slot: The FrameRing slot holding the frame
+    :param index: The index of the row in the tab
+    :param tab: The tab the row is on
+    :param check_status: Whether to read the completed status, the row is assumed completed otherwise
+    :param known_id: The ID the row was already matched to in a previous scan, -1 if unknown
+    :param previous_id: The ID of the last row of the tab matched so far, -1 if unknown
+    :param lookahead: The number of achievements following the previous one to try first
+    :return: Whether the row is completed, whether it is claimable, the closest match name, ID and score,
+        the name and description read, and the durations of the stages
+    """
+    result = _process_frame(slot, index, tab, check_status, known_id, previous_id, lookahead)
+    return *result, timings.drain()
+
+
+def _process_frame(slot: int, index: int, tab: int, check_status: bool, known_id: int, previous_id: int,
+                   lookahead: int) -> tuple[bool, bool, str, int, float, tuple[str, str]]:
+    frame = Frame(_worker["frames"][slot])
+    game_data: GameData = _worker["game_data"]
+    is_completed, is_claimable = True, False
+    if check_status:
+        classifier: StatusClassifier = _worker["classifier"]
+        is_completed, is_claimable = get_completed_status(
+            index, frame, _worker["method"], _worker["lang"], classifier, classifier.classify_page(frame, [index])[0][0]
+        )
+        if not is_completed:
+            return False, False, "", -1, 0., ("", "")
+    if known_id >= 0:
+        return is_completed, is_claimable, game_data.data[str(known_id)]["title"], known_id, 1., ("", "")
+    chive_name, chive_id, score = game_data.match_name(
+        index, frame, _worker["lang"], tab=tab, previous_id=previous_id,
+        lookahead=lookahead, method=_worker["method"], glyphs=_worker["glyphs"],
+    )
+    return is_completed, is_claimable, chive_name, chive_id, score, game_data.last_read
@@ -1,51 +1,68 @@
-import time
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
 
-import win32gui
-from PyQt6 import QtCore
+import numpy as np
 
-from logic.game_data import GameData
+from logic.delta import DeltaScan
+from logic.game_data import PREDICTION_WINDOW, GameData
+from logic.listener import ScanListener
+from logic.pipeline import FrameRing, init_worker, process_frame
+from utils.backends import Backends, win32_backends
+from utils.data import create_debug_folder, get_json_data
+from utils.debug_writer import POLICY_DROP
+from utils.flight_recorder import FlightRecorder
+from utils.glyph_ocr import GlyphRecognizer
+from utils.journal import ScanJournal, load_journal
+from utils.match_cache import MatchCache, text_digest
 from utils.ocr import get_completed_status
-from utils.screenshot import Screenshot
+from utils.ocr_engine import OCR_ENGINES, TesseractEngine, available_engines
+from utils.screenshot import Frame, Screenshot
 from utils.navigation import Navigation
+from utils.session import SessionRecorder
+from utils.settle import SettleDetector
+from utils.status_classifier import PAGE_ROWS, StatusClassifier
+from utils.timing import timings
 
 SUPPORTED_ASPECT_RATIOS = ["16:9"]
+MATCH_CACHE_FILE = "row_hashes.json"
+GLYPH_ATLAS_FILE = "glyph_atlas.npz"
+GLYPH_LEARN_MIN_CONFIDENCE = 0.9  # Rows matched with a lower score are not used to learn glyphs
+MATCH_CACHE_MIN_CONFIDENCE = 0.9
+FLIGHT_RECORDER_MIN_CONFIDENCE = 0.7  # Matches below this score dump the flight recorder
+FIRST_SCROLLING_ROW = 4  # Going down from the rows above only moves the selection, not the list
+PIPELINE_INTERRUPTED = object()
+PIPELINE_TAB_END = object()
 
 
-class HSRScanner(QtCore.QObject):
-    update_signal = QtCore.pyqtSignal(int)
-    log_signal = QtCore.pyqtSignal(str)
-    complete_signal = QtCore.pyqtSignal()
-
-    def __init__(self, config: dict, game_data: GameData, method: str = "tesseract", lang="en"):
+class HSRScanner:
+    def __init__(self, config: dict, game_data: GameData, method: str = "tesseract", lang="en",
+                 backends: Backends | None = None, listener: ScanListener | None = None):
         """Constructor
 
                 :param config: The config dict
                 :param game_data: The GameData class instance
+                :param method: The OCR method
+                :param lang: language code
+                :param backends: The window, capture and input backends, the live game on Windows if None
+                :param listener: Receives the logs and progress of the scan, they are dropped if None
                 :raises Exception: Thrown if the game is not found
                 :raises Exception: Thrown if no scan options are selected
+                :raises Exception: Thrown if the OCR method is not installed
                 """
-        super().__init__()
-        for i, game_name in enumerate(
-                [
-                    "Honkai: Star Rail",
-                    "崩坏：星穹铁道",
-                    "崩壞：星穹鐵道",
-                    "붕괴:\u00A0스타레일",
-                    "崩壊：スターレイル",
-                    "Honkai\u00A0: Star Rail",
-                ]
-        ):
-            self._hwnd = win32gui.FindWindow("UnityWndClass", game_name)
-            if self._hwnd:
-                self._is_en = i == 0
-                break
-        if not self._hwnd:
-            raise Exception(
-                "Honkai: Star Rail not found. Please open the game and try again."
-            )
+        self._listener = listener or ScanListener()
+        if method not in OCR_ENGINES or not OCR_ENGINES[method].available():
+            raise Exception(f"OCR method {method} not available. Available OCR methods: {available_engines()}")
+        if backends is None:
+            backends = win32_backends()
+        if config.get("record_session"):
+            backends = SessionRecorder(config["record_session"], backends).backends
+        self._backends = backends
+        self._is_en = self._backends.window.find_game()
         self._game_data = game_data
         self._config = config
-        self._nav = Navigation(self._hwnd, self._config)
+        self._nav = Navigation(self._backends.window, self._backends.gamepad, self._config)
 
         self._aspect_ratio = self._nav.get_aspect_ratio()
         if self._aspect_ratio not in SUPPORTED_ASPECT_RATIOS:
@@ -54,11 +71,36 @@ class HSRScanner(QtCore.QObject):
             )
 
         self._screenshot = Screenshot(
-            self._hwnd,
+            self._backends.window,
+            self._backends.capture,
             config["debug"],
             config["debug_output_location"],
+            config.get("debug_policy", POLICY_DROP),
         )
+        if config.get("adaptive_settle", True):
+            self._nav.attach_settle_detector(SettleDetector(self._screenshot.grab_list_thumbnail, self._backends.clock))
+
+        self._match_cache = None
+        self._glyph_atlas = ""
+        if config.get("cache_location"):
+            self._match_cache = MatchCache(
+                os.path.join(config["cache_location"], MATCH_CACHE_FILE), game_data.version
+            )
+            self._glyph_atlas = os.path.join(config["cache_location"], GLYPH_ATLAS_FILE)
+        self._glyphs = GlyphRecognizer(self._glyph_atlas, lang)
 
+        self._resume = None
+        self._resumed_rows: dict[tuple[int, int], tuple[str, int]] = {}
+        self._journal = None
+        if config.get("journal"):
+            if config.get("resume"):
+                self._resume = load_journal(config["journal"], game_data.version)
+                if self._resume is None and os.path.exists(config["journal"]):
+                    self._listener.log("The unfinished previous scan is out of date, starting over.")
+            self._journal = ScanJournal(config["journal"], append=self._resume is not None, version=game_data.version)
+        self._finished = False
+
+        self._flight_recorder = FlightRecorder()
         self._interrupt_event = False
         self._method = method
         self._lang = lang
@@ -69,68 +111,595 @@ class HSRScanner(QtCore.QObject):
         :return: The scan results
         """
         if not self._is_en:
-            self.log_signal.emit(
+            self._listener.log(
                 "ERROR: Non-English game name detected. The scanner only works with English text."
             )
+        if self._method == "tesseract" and not TesseractEngine.in_process():
+            self._listener.log("tesserocr is not installed, Tesseract runs as one process per crop, which is slower.")
         self._nav.bring_window_to_foreground()
-        self.log_signal.emit("Scanning starting...")
-        result = self.scan()
-        self.log_signal.emit("Scanning complete!")
-        return {"achievements": result}
+        self._listener.log("Scanning starting...")
+        timings.reset(self._config.get("timings", False))
+        try:
+            result = self.scan()
+        except Exception as e:
+            self._dump_flight_recorder(f"error: {e}")
+            raise
+        finally:
+            if self._match_cache is not None:
+                self._match_cache.save()
+            self._glyphs.save()
+            dropped = self._screenshot.close()
+            self._backends.close()
+            if self._journal is not None:
+                self._journal.close(self._finished)
+        if dropped:
+            self._listener.log(f"[DEBUG] {dropped} screenshots were not saved, the debug writer fell behind.")
+        if self._interrupt_event:
+            self._dump_flight_recorder("interrupted")
+        if self._nav.settle:
+            self._listener.log("Settle latencies: " + self._nav.settle.summary())
+        self._listener.log("Scanning complete!")
+        if not timings.enabled:
+            return {"achievements": result}
+        self._listener.log("Time per stage:\n" + timings.report())
+        return {"achievements": result, "timings": timings.summary()}
 
     def stop_scan(self) -> None:
         """Stops the scan"""
         self._interrupt_event = True
 
+    @property
+    def interrupted(self) -> bool:
+        """:return: Whether the scan was stopped or lost the game focus before the end"""
+        return self._interrupt_event
+
+    def _dump_flight_recorder(self, reason: str) -> None:
+        """Save the last frames and row results, into the debug folder
+
+        :param reason: Why the scan needs diagnostics
+        """
+        output_location = self._config.get("debug_output_location")
+        if not output_location:
+            if not self._config.get("flight_recorder_location"):
+                return
+            output_location = create_debug_folder(self._config["flight_recorder_location"])
+            self._config["debug_output_location"] = output_location
+        dump_location = self._flight_recorder.dump(output_location, reason)
+        if dump_location is not None:
+            self._listener.log(f"[DEBUG] {reason}, saved the last frames to {dump_location}")
+
+    def _record_row(self, frame_id: int, tab: int, index: int, chive_name: str, chive_id: int, score: float,
+                    read: tuple[str, str]) -> None:
+        """Keep a matched row in the flight recorder, dumping it if the match is not confident
+
+        :param frame_id: The flight recorder sequence number of the frame the row is on
+        :param tab: The tab the row is on
+        :param index: The index of the row
+        :param chive_name: The matched name
+        :param chive_id: The matched ID
+        :param score: The match score
+        :param read: The name and description read from the screen, empty if the row was matched from the cache
+        """
+        self._flight_recorder.record_row(
+            frame_id, tab, index, name=chive_name, id=chive_id, score=score, text=read[0], desc=read[1]
+        )
+        if score < FLIGHT_RECORDER_MIN_CONFIDENCE:
+            self._dump_flight_recorder(f"Low confidence match {score:.2f} for {chive_name}")
+
+    def _learn_glyphs(self, name_crop: np.ndarray, chive_name: str, score: float, read: tuple[str, str]) -> None:
+        """Learn the glyphs of the title of a confident match read from the screen
+
+        :param name_crop: The name crop of the row
+        :param chive_name: The matched name
+        :param score: The match score
+        :param read: The name and description read from the screen, empty if the row was matched from the cache
+        """
+        if read[0] and score >= GLYPH_LEARN_MIN_CONFIDENCE:
+            with timings.span("scan.learn_glyphs"):
+                self._glyphs.learn(name_crop, chive_name)
+
+    def _remember_match(self, name_hash: str, chive_name: str, chive_id: int, score: float) -> None:
+        """Remember a confident match in the match cache
+
+        Titles shared by several achievements are never cached, as their name crops look the same.
+
+        :param name_hash: The text digest of the name crop
+        :param chive_name: The matched name
+        :param chive_id: The matched ID
+        :param score: The match score
+        """
+        if score >= MATCH_CACHE_MIN_CONFIDENCE and chive_name not in self._game_data.duplicate_groups:
+            self._match_cache.put(name_hash, chive_id, score)
+
+    def _cached_match(self, name_hash: str) -> int:
+        """Look up the match cache
+
+        :param name_hash: The text digest of the name crop
+        :return: The cached achievement ID, -1 if unknown
+        """
+        cached = self._match_cache.get(name_hash)
+        if cached is None or str(cached[0]) not in self._game_data.data:
+            return -1
+        return cached[0]
+
+    @property
+    def _hashes_rows(self) -> bool:
+        """:return: Whether the name crops are hashed, for the match cache or the journal"""
+        return self._match_cache is not None or self._journal is not None
+
+    def _known_row(self, tab: int, index: int, name_hash: str) -> int:
+        """Get the achievement of a row from the journal of the resumed scan or the match cache
+
+        The rows of a title shared by several achievements have the same name crop, so their journaled ID is not
+        reused.
+
+        :param tab: The tab the row is on
+        :param index: The index of the row
+        :param name_hash: The text digest of the name crop, empty if rows are not hashed
+        :return: The achievement ID, -1 if unknown
+        """
+        if not name_hash:
+            return -1
+        resumed = self._resumed_rows.get((tab, index))
+        if resumed is not None and resumed[0] == name_hash and str(resumed[1]) in self._game_data.data:
+            if self._game_data.data[str(resumed[1])]["title"] not in self._game_data.duplicate_groups:
+                return resumed[1]
+        if self._match_cache is None:
+            return -1
+        return self._cached_match(name_hash)
+
+    def _resume_scan(self) -> tuple[int, list[int]]:
+        """Go to the first unfinished tab of the resumed scan
+
+        The rows of that tab are scanned again, as they move when achievements are claimed between the two scans,
+        but the rows whose name crop did not change are not read again.
+
+        :return: The first tab to scan and the achievements found in the finished tabs
+        """
+        if self._resume is None:
+            return 1, []
+        start_tab, entries = self._resume
+        completed_list: list[int] = []
+        for entry in entries:
+            if entry["tab"] < start_tab and entry["id"] not in completed_list:
+                completed_list.append(entry["id"])
+                self._listener.progress(entry["tab"])
+            elif entry["tab"] == start_tab and entry["hash"]:
+                self._resumed_rows[(entry["tab"], entry["index"])] = (entry["hash"], entry["id"])
+        self._listener.log(
+            f"Resuming the previous scan at tab {start_tab}, {len(completed_list)} achievements already found."
+        )
+        for _ in range(1, min(start_tab, 9)):
+            self._nav.change_tab()
+            self._backends.gamepad.sleep(0.3)
+        return start_tab, completed_list
+
+    def _match_row(self, index: int, frame: Frame, tab: int, name_hash: str = "",
+                   previous_id: int = -1,
+                   lookahead: int = PREDICTION_WINDOW) -> tuple[str, int, float, tuple[str, str]]:
+        """Match the name of a row, without OCR if its name crop was already seen
+
+        :param index: The index of the row
+        :param frame: The frame the row is on
+        :param tab: The tab the row is on
+        :param name_hash: The text digest of the name crop, empty if rows are not hashed
+        :param previous_id: The ID of the previous matched row of the tab, -1 if unknown
+        :param lookahead: The number of achievements following the previous one to try first
+        :return: The closest match name, ID and score, and the name and description read from the screen
+        """
+        known_id = self._known_row(tab, index, name_hash)
+        if known_id >= 0:
+            return self._game_data.data[str(known_id)]["title"], known_id, 1., ("", "")
+        chive_name, chive_id, score = self._game_data.match_name(
+            index, frame, self._lang, tab=tab, previous_id=previous_id, lookahead=lookahead,
+            method=self._method, glyphs=self._glyphs,
+        )
+        if self._match_cache is not None:
+            self._remember_match(name_hash, chive_name, chive_id, score)
+        return chive_name, chive_id, score, self._game_data.last_read
+
+    def _is_game_focused(self) -> bool:
+        return self._backends.window.is_foreground()
+
+    def _load_delta(self) -> DeltaScan | None:
+        """Load the previous scan result for a delta scan
+
+        :return: The delta scan, or None if there is no usable previous scan
+        """
+        previous_scan = self._config.get("previous_scan")
+        if not previous_scan:
+            return None
+        if not self._game_data.tabs:
+            self._listener.log("Game data series do not match the tabs of the menu, doing a full scan.")
+            return None
+        try:
+            previous_completed = get_json_data(previous_scan)["achievements"]
+        except (OSError, ValueError, KeyError) as e:
+            self._listener.log(f"Could not load previous scan {previous_scan} ({e}), doing a full scan.")
+            return None
+        self._listener.log(f"Delta scan from {previous_scan}")
+        return DeltaScan(self._game_data, previous_completed)
+
+    def _record_completed(self, chive_name: str, chive_id: int, tab: int, completed_list: list[int],
+                          source: str = "", index: int = -1, name_hash: str = "") -> None:
+        """Add a completed achievement to the result and the journal
+
+        :param chive_name: The achievement name
+        :param chive_id: The achievement ID
+        :param tab: The tab the achievement is on
+        :param completed_list: The result
+        :param source: Where the achievement was known from, if not read from the screen
+        :param index: The index of its row, -1 if it was not read from the screen
+        :param name_hash: The text digest of the name crop of its row
+        """
+        with timings.span("scan.events"):
+            self._listener.log(f"Achievement: {chive_name} | with id: {chive_id} is completed{source}.")
+            self._listener.progress(tab)
+        completed_list.append(chive_id)
+        if self._journal is not None:
+            self._journal.record(chive_id, tab, index, name_hash)
+
+    def _complete_from_delta(self, delta: DeltaScan | None, tab: int, rows_seen: int, seen: set[int],
+                             in_claimed_section: bool, completed_list: list[int]) -> bool:
+        """Check if the rest of the tab is known, recording the known achievements
+
+        :param delta: The delta scan, if any
+        :param tab: The current tab
+        :param rows_seen: The number of rows of the tab seen so far
+        :param seen: The IDs of the achievements of the tab seen so far
+        :param in_claimed_section: Whether the claimed section of the tab has been reached
+        :param completed_list: The result
+        :return: Whether the tab is finished
+        """
+        if delta is None:
+            return False
+        if in_claimed_section:
+            known = delta.known_rest_of_tab(tab, rows_seen, seen)
+            if known is not None:
+                for chive_id in known:
+                    self._record_completed(
+                        self._game_data.data[str(chive_id)]["title"], chive_id, tab, completed_list,
+                        " (from previous scan)"
+                    )
+                self._listener.log(
+                    f"Tab {tab} finished from the previous scan, {len(known)} rows were not scrolled through"
+                )
+                return True
+        return self._tab_exhausted(delta, tab, rows_seen)
+
+    def _tab_exhausted(self, delta: DeltaScan | None, tab: int, rows_seen: int) -> bool:
+        """Check if every row of a tab was seen, from the size of the tab in the game data
+
+        :param delta: The delta scan, if any
+        :param tab: The current tab
+        :param rows_seen: The number of rows of the tab seen so far
+        :return: Whether the tab is finished
+        """
+        if delta is None or not delta.is_tab_exhausted(tab, rows_seen):
+            return False
+        self._listener.log(f"Tab {tab} ended after its {rows_seen} rows, from the size of the tab in the game data")
+        return True
+
+    @staticmethod
+    def _row_status(classifier: StatusClassifier, frame: Frame, index: int,
+                    statuses: dict[int, str | None]) -> str | None:
+        """Classify the status of a row, the rows of the first page of a tab all in one call
+
+        The list does not scroll before its last visible row, so the first frame of a tab shows the rows of the
+        whole first page. Below it, every frame shows a single new row.
+
+        :param classifier: The status classifier
+        :param frame: The frame of the row
+        :param index: The index of the row in the tab
+        :param statuses: The statuses of the rows of the tab classified so far, updated
+        :return: The status, None if the classifier is unsure
+        """
+        if index not in statuses and index < PAGE_ROWS:
+            statuses.update(enumerate(status for status, _ in classifier.classify_page(frame)))
+        elif statuses.get(index) is None:  # Not classified yet, or templates may have been learned since
+            statuses[index] = classifier.classify_page(frame, [index])[0][0]
+        return statuses[index]
+
+    def _is_duplicate_tab_end(self, chive_name: str, index: int) -> bool:
+        """Check if matching the same achievement twice in a row means the bottom of the tab was hit
+
+        When go_down can tell that the list did not move, the bottom is detected visually instead, so a repeated
+        match is two neighbouring rows read as the same achievement. Above FIRST_SCROLLING_ROW the list does not
+        scroll, so the bottom is only detected by the repeated match.
+
+        :param chive_name: The repeated achievement name
+        :param index: The index of the row matched again
+        :return: Whether the tab is finished
+        """
+        if not self._nav.detects_list_end or index <= FIRST_SCROLLING_ROW:
+            return True
+        self._listener.log(f"Achievement: {chive_name} matched twice in a row, ignoring it.")
+        return False
+
+    def _at_list_end(self, index: int, moved: bool | None) -> bool:
+        """Check if going down from a row hit the bottom of the tab
+
+        The list not moving is only trusted once it scrolls, and after confirm_list_end.
+
+        :param index: The index of the row go_down was pressed on
+        :param moved: What go_down returned
+        :return: Whether the bottom of the tab was reached
+        """
+        if moved is not False or index < FIRST_SCROLLING_ROW or not self._nav.confirm_list_end():
+            return False
+        self._listener.log(f"Bottom of the tab reached after {index + 1} rows")
+        return True
+
+    def _end_tab(self, tab: int, count: int) -> None:
+        """Log the end of a tab and checkpoint it in the journal
+
+        :param tab: The finished tab
+        :param count: The number of completed achievements in the tab
+        """
+        self._listener.log(f"{count} completed achievements in tab {tab}")
+        if self._journal is not None:
+            self._journal.end_tab(tab)
+        self._finished = tab == 9
+        if tab == 9:
+            self._listener.log("Scanned all achievements.")
+        else:
+            self._listener.log("Hit the bottom of the page. Switching tabs.")
+
     def scan(self) -> list[int]:
         self._nav.wake_up()
         if self._interrupt_event:
             return []
+        delta = self._load_delta()
+        current_tab, completed_list = self._resume_scan()
+        if current_tab > 9:
+            self._finished = True
+            return completed_list
+        if self._config.get("workers", 1) > 1:
+            return self._scan_pipelined(self._config["workers"], delta, current_tab, completed_list)
 
-        completed_list: list[int] = []
+        classifier = StatusClassifier()
 
         last_chive_id: int = -1
-        current_tab: int = 1
         index: int = 0
-        last_completed: int = 0
-        completed_count: int = 0
+        last_completed: int = len(completed_list)
         had_completed = False
+        seen_in_tab: set[int] = set()
+        statuses: dict[int, str | None] = {}
+        last_match_index: int = -1
+        at_bottom = False
 
         while index < 700:
-            if win32gui.GetForegroundWindow() != win32gui.FindWindow("UnityWndClass", "Honkai: Star Rail"):
-                self.log_signal.emit("Scan interrupted")
+            if not self._is_game_focused():
+                self._listener.log("Scan interrupted")
+                self._interrupt_event = True
                 break
-            if not had_completed:
-                is_chive_completed, is_claimable = get_completed_status(index, self._screenshot, self._method, self._lang)
+            tab_finished = at_bottom
+            is_chive_completed = not at_bottom
+            frame, frame_id = None, 0
+            if not at_bottom:
+                frame = self._screenshot.capture_frame()
+                frame_id = self._flight_recorder.record_frame(frame.pixels)
+            if not had_completed and not at_bottom:
+                with timings.span("scan.status"):
+                    is_chive_completed, is_claimable = get_completed_status(
+                        index, frame, self._method, self._lang, classifier,
+                        self._row_status(classifier, frame, index, statuses),
+                    )
                 if not is_chive_completed:
-                    self.log_signal.emit("Skipped uncompleted achievement")
-                    self._nav.go_down()
-                    index += 1
-                    continue
-                if is_chive_completed and not is_claimable:
+                    self._listener.log("Skipped uncompleted achievement")
+                    tab_finished = self._tab_exhausted(delta, current_tab, index + 1)
+                elif not is_claimable:
                     had_completed = True
-            if self._interrupt_event:
-                break
-            chive_name, chive_id = self._game_data.get_closest_name_match(index, self._screenshot, self._lang)
-            if chive_id == last_chive_id:
-                # self.log_signal.emit(f"Debug: {chive_id} {chive_name}")
-                self.log_signal.emit(f"{completed_count - last_completed} completed achievements in tab {current_tab}")
-                last_completed = completed_count
+            if is_chive_completed:
+                if self._interrupt_event:
+                    break
+                name_hash = text_digest(frame.name(index)) if self._hashes_rows else ""
+                with timings.span("scan.match"):
+                    chive_name, chive_id, score, read = self._match_row(
+                        index, frame, current_tab, name_hash,
+                        previous_id=last_chive_id if seen_in_tab else -1,
+                        lookahead=PREDICTION_WINDOW + index - last_match_index - 1,
+                    )
+                self._record_row(frame_id, current_tab, index, chive_name, chive_id, score, read)
+                self._learn_glyphs(frame.name(index), chive_name, score, read)
+                if chive_id == last_chive_id:
+                    # self._listener.log(f"Debug: {chive_id} {chive_name}")
+                    tab_finished = self._is_duplicate_tab_end(chive_name, index)
+                else:
+                    self._record_completed(
+                        chive_name, chive_id, current_tab, completed_list, index=index, name_hash=name_hash
+                    )
+                    seen_in_tab.add(chive_id)
+                    last_chive_id = chive_id
+                    last_match_index = index
+                    tab_finished = self._complete_from_delta(
+                        delta, current_tab, index + 1, seen_in_tab, had_completed, completed_list
+                    )
+            if tab_finished:
+                self._end_tab(current_tab, len(completed_list) - last_completed)
+                last_completed = len(completed_list)
                 if current_tab == 9:
-                    self.log_signal.emit("Scanned all achievements.")
                     break
-                self.log_signal.emit("Hit the bottom of the page. Switching tabs.")
                 index = 0
                 had_completed = False
+                seen_in_tab = set()
+                statuses = {}
+                at_bottom = False
                 self._nav.change_tab()
                 current_tab += 1
-                time.sleep(0.3)
+                self._backends.gamepad.sleep(0.3)
                 continue
-            self.log_signal.emit(f"Achievement: {chive_name} | with id: {chive_id} is completed.")
-            completed_list.append(chive_id)
-            completed_count += 1
-            self.update_signal.emit(current_tab)
-            last_chive_id = chive_id
-            self._nav.go_down()
+            at_bottom = self._at_list_end(index, self._nav.go_down())
             index += 1
         return completed_list
+
+    def _scan_pipelined(self, workers: int, delta: DeltaScan | None = None, start_tab: int = 1,
+                        completed_list: list[int] | None = None) -> list[int]:
+        """Scan with navigation and capture on a thread, OCR and matching on a process pool
+
+        The navigation thread keeps going down while the workers read the previous frames, and frames are handed
+        to the workers through shared memory. Results are collected in capture order, so the tab-end logic is the
+        same as the serial scan. Frames captured after the bottom of a tab are dropped.
+
+        :param workers: The number of worker processes
+        :param delta: The delta scan, if any
+        :param start_tab: The tab to start from, the navigation being already on it
+        :param completed_list: The achievements found in the previous tabs
+        :return: The IDs of the completed achievements
+        """
+        ring = FrameRing(workers * 2)
+        pending: queue.Queue = queue.Queue()
+        stop = threading.Event()
+        tab_done = [start_tab - 1]  # Last tab whose bottom was hit, written by the collector
+        status_known: set[int] = set()  # Tabs where every remaining achievement is completed
+        last_match: list[tuple[int, int, int] | None] = [None]  # Tab, index and ID of the last match of the collector
+        pool = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=init_worker,
+            initargs=(
+                self._game_data.data, self._method, self._lang, ring.name, ring.slots, timings.enabled,
+                self._glyph_atlas,
+            ),
+        )
+
+        def navigate() -> None:
+            current_tab: int = start_tab
+            index: int = 0
+            try:
+                while index < 700 and not stop.is_set() and not self._interrupt_event:
+                    if not self._is_game_focused():
+                        pending.put(PIPELINE_INTERRUPTED)
+                        return
+                    if tab_done[0] >= current_tab:
+                        if current_tab == 9:
+                            break
+                        index = 0
+                        self._nav.change_tab()
+                        current_tab += 1
+                        self._backends.gamepad.sleep(0.3)
+                        continue
+                    frame = self._screenshot.capture_frame()
+                    slot = None
+                    while slot is None and not stop.is_set():
+                        try:
+                            slot = ring.acquire(timeout=0.1)
+                        except queue.Empty:
+                            pass
+                    if slot is None:
+                        break
+                    ring.write(slot, frame.pixels)
+                    name_hash = text_digest(frame.name(index)) if self._hashes_rows else ""
+                    known_id = self._known_row(current_tab, index, name_hash)
+                    previous_id, lookahead = -1, PREDICTION_WINDOW
+                    if last_match[0] is not None and last_match[0][0] == current_tab:
+                        _, match_index, previous_id = last_match[0]
+                        lookahead = PREDICTION_WINDOW + index - match_index - 1
+                    future = pool.submit(
+                        process_frame, slot, index, current_tab, current_tab not in status_known, known_id,
+                        previous_id, lookahead,
+                    )
+                    pending.put((current_tab, index, frame.pixels, slot, future, name_hash, known_id))
+                    at_bottom = self._at_list_end(index, self._nav.go_down())
+                    index += 1
+                    if at_bottom:  # No need to wait for the collector
+                        pending.put((PIPELINE_TAB_END, current_tab))
+                        if current_tab == 9:
+                            break
+                        index = 0
+                        self._nav.change_tab()
+                        current_tab += 1
+                        self._backends.gamepad.sleep(0.3)
+            except Exception as e:
+                pending.put(e)
+            pending.put(None)
+
+        navigator = threading.Thread(target=navigate, daemon=True)
+        navigator.start()
+
+        completed_list = completed_list if completed_list is not None else []
+        last_chive_id: int = -1
+        current_tab: int = start_tab
+        rows_seen: int = 0
+        last_completed: int = len(completed_list)
+        had_completed = False
+        seen_in_tab: set[int] = set()
+        try:
+            while True:
+                item = pending.get()
+                if item is None:
+                    break
+                if item is PIPELINE_INTERRUPTED:
+                    self._listener.log("Scan interrupted")
+                    self._interrupt_event = True
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                if item[0] is PIPELINE_TAB_END:
+                    if item[1] == current_tab:
+                        self._end_tab(current_tab, len(completed_list) - last_completed)
+                        last_completed = len(completed_list)
+                        tab_done[0] = current_tab
+                        if current_tab == 9:
+                            break
+                        had_completed = False
+                        seen_in_tab = set()
+                        rows_seen = 0
+                        current_tab += 1
+                    continue
+                tab, index, pixels, slot, future, name_hash, known_id = item
+                with timings.span("scan.wait"):
+                    error = future.exception()  # Waits for the worker to be done with the slot
+                ring.release(slot)
+                if tab != current_tab:  # Captured after the bottom of the previous tab
+                    continue
+                frame_id = self._flight_recorder.record_frame(pixels)
+                if error is not None:
+                    raise error
+                is_chive_completed, is_claimable, chive_name, chive_id, score, read, worker_spans = future.result()
+                timings.merge(worker_spans)
+                if chive_id >= 0:
+                    self._record_row(frame_id, current_tab, index, chive_name, chive_id, score, read)
+                    self._learn_glyphs(Frame(pixels).name(index), chive_name, score, read)
+                if self._match_cache is not None and known_id < 0 and chive_id >= 0:
+                    self._remember_match(name_hash, chive_name, chive_id, score)
+                rows_seen += 1
+                tab_finished = False
+                if had_completed:
+                    is_chive_completed = chive_id >= 0  # Unmatched if its status was read before had_completed
+                elif is_chive_completed and not is_claimable:
+                    had_completed = True
+                    status_known.add(current_tab)
+                if not is_chive_completed:
+                    self._listener.log("Skipped uncompleted achievement")
+                    tab_finished = self._tab_exhausted(delta, current_tab, rows_seen)
+                if is_chive_completed:
+                    if self._interrupt_event:
+                        break
+                    if chive_id == last_chive_id:
+                        tab_finished = self._is_duplicate_tab_end(chive_name, index)
+                    else:
+                        self._record_completed(
+                            chive_name, chive_id, current_tab, completed_list, index=index, name_hash=name_hash
+                        )
+                        seen_in_tab.add(chive_id)
+                        last_chive_id = chive_id
+                        last_match[0] = (current_tab, index, chive_id)
+                        tab_finished = self._complete_from_delta(
+                            delta, current_tab, rows_seen, seen_in_tab, had_completed, completed_list
+                        )
+                if tab_finished:
+                    self._end_tab(current_tab, len(completed_list) - last_completed)
+                    last_completed = len(completed_list)
+                    tab_done[0] = current_tab
+                    if current_tab == 9:
+                        break
+                    had_completed = False
+                    seen_in_tab = set()
+                    rows_seen = 0
+                    current_tab += 1
+        finally:
+            stop.set()
+            navigator.join()
+            pool.shutdown(cancel_futures=True)
+            ring.close()
+        return completed_list
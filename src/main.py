@@ -1,17 +1,26 @@
 import asyncio
 import datetime
+import multiprocessing
+import os
+import threading
 
-import pytesseract
 from pynput.keyboard import Key, Listener
 
 from PyQt6 import QtCore, QtGui, QtWidgets
 
-from logic.game_data import GameData
+from logic.game_data import GameData, load_game_data
+from logic.pipeline import default_workers
+from logic.listener import ScanListener
 from logic.scanner import HSRScanner
 from ui.form import Ui_MainWindow
-from utils.data import create_debug_folder, executable_path, resource_path, save_to_json
+from utils.data import create_debug_folder, executable_path, find_latest_scan, resource_path, save_scan_result
+from utils.journal import JOURNAL_FILE, load_journal
+from utils.stardb import StarDBClient
 
-pytesseract.pytesseract.tesseract_cmd = resource_path("assets/tesseract/tesseract.exe")
+
+UI_REFRESH_INTERVAL = 100  # Milliseconds between two deliveries of the scanner logs and progress to the UI
+LOG_MAX_BLOCKS = 5000  # Lines kept in the log box
+DEVELOPER_OPTION_HEIGHT = 20  # Pixels added to the Developer group for each checkbox added to it
 
 
 class ScannerUI(QtWidgets.QMainWindow, Ui_MainWindow):
@@ -22,11 +31,15 @@ class ScannerUI(QtWidgets.QMainWindow, Ui_MainWindow):
     def __init__(self) -> None:
         super().__init__()
         self._scanner_thread = None
+        # logs and progress of the scanner thread, buffered and delivered in batches, reused by every scan
+        self._scanner_events = ScannerEventBuffer(self.append_log_lines, self.add_progress, parent=self)
         self._listener = InterruptListener()
         self.settings = QtCore.QSettings("hashblen", "HSRAchievementScanner")
 
         # fetch game data
-        self._fetch_game_data_thread = FetchGameDataThread()
+        self._fetch_game_data_thread = FetchGameDataThread(
+            os.path.join(self.settings.value("output_location", executable_path("StarRailData")), "cache")
+        )
         self._fetch_game_data_thread.result_signal.connect(self.handle_game_data)
         self._fetch_game_data_thread.error_signal.connect(self.handle_game_data_error)
         self._fetch_game_data_thread.start()
@@ -67,12 +80,46 @@ class ScannerUI(QtWidgets.QMainWindow, Ui_MainWindow):
 
     def setup_ui(self, MainWindow: QtWidgets.QMainWindow) -> None:
         super().setupUi(MainWindow)
+        self.textEditLog.setMaximumBlockCount(LOG_MAX_BLOCKS)
         self.pushButtonChangeLocation.clicked.connect(self.change_output_location)
         self.pushButtonOpenLocation.clicked.connect(self.open_output_location)
         self.pushButtonRestoreDefaults.clicked.connect(self.reset_settings)
+        self.checkBoxDeltaScan = self.add_developer_option(
+            "Delta scan", "Finishes a tab early from the last result and the size of the tab"
+        )
+        self.checkBoxParallelOcr = self.add_developer_option(
+            "Parallel OCR", "Reads the rows in worker processes while navigating, uses more CPU and memory"
+        )
+        self.checkBoxTimings = self.add_developer_option(
+            "Stage timings", "Logs the time spent in each stage of the scan and saves it next to the result"
+        )
+
+        # cookie of stardb.gg, the result of each scan is uploaded when it is set
+        self.groupBoxStarDB = QtWidgets.QGroupBox("stardb.gg", parent=self.Configure)
+        self.groupBoxStarDB.setGeometry(QtCore.QRect(220, 110, 201, 61))
+        self.lineEditStarDBCookie = QtWidgets.QLineEdit(parent=self.groupBoxStarDB)
+        self.lineEditStarDBCookie.setGeometry(QtCore.QRect(10, 20, 181, 31))
+        self.lineEditStarDBCookie.setEchoMode(QtWidgets.QLineEdit.EchoMode.Password)
+        self.lineEditStarDBCookie.setPlaceholderText("id cookie")
+        self.lineEditStarDBCookie.setToolTip("Uploads the achievements found by each scan to stardb.gg")
 
         self.load_settings()
 
+    def add_developer_option(self, text: str, tool_tip: str) -> QtWidgets.QCheckBox:
+        """Adds a checkbox under the ones of the Developer group, growing the group to fit it
+
+        :param text: The text of the checkbox
+        :param tool_tip: The tool tip of the checkbox
+        :return: The checkbox
+        """
+        check_box = QtWidgets.QCheckBox(text, parent=self.verticalLayoutWidget)
+        check_box.setToolTip(tool_tip)
+        self.verticalLayout_2.addWidget(check_box)
+        for widget in [self.groupBox_8, self.verticalLayoutWidget]:
+            widget.resize(widget.width(), widget.height() + DEVELOPER_OPTION_HEIGHT)
+        self.groupBox_7.move(self.groupBox_7.x(), self.groupBox_7.y() + DEVELOPER_OPTION_HEIGHT)
+        return check_box
+
     def change_output_location(self) -> None:
         """Opens a dialog to change the output location of the scan"""
         new_output_location = QtWidgets.QFileDialog.getExistingDirectory(
@@ -100,6 +147,16 @@ class ScannerUI(QtWidgets.QMainWindow, Ui_MainWindow):
         self.checkBoxDebugMode.setChecked(
             self.settings.value("debug_mode", False) == "true"
         )
+        self.checkBoxDeltaScan.setChecked(
+            self.settings.value("delta_scan", False) == "true"
+        )
+        self.checkBoxParallelOcr.setChecked(
+            self.settings.value("parallel_ocr", False) == "true"
+        )
+        self.checkBoxTimings.setChecked(
+            self.settings.value("timings", False) == "true"
+        )
+        self.lineEditStarDBCookie.setText(self.settings.value("stardb_cookie", ""))
         self.spinBoxNavDelay.setValue(self.settings.value("nav_delay", 0))
         self.spinBoxScanDelay.setValue(self.settings.value("scan_delay", 0))
         self.comboBoxScanner.setCurrentIndex(self.settings.value("scanner", 0))
@@ -109,6 +166,10 @@ class ScannerUI(QtWidgets.QMainWindow, Ui_MainWindow):
         """Saves the settings for the scan"""
         self.settings.setValue("output_location", self.lineEditOutputLocation.text())
         self.settings.setValue("debug_mode", self.checkBoxDebugMode.isChecked())
+        self.settings.setValue("delta_scan", self.checkBoxDeltaScan.isChecked())
+        self.settings.setValue("parallel_ocr", self.checkBoxParallelOcr.isChecked())
+        self.settings.setValue("timings", self.checkBoxTimings.isChecked())
+        self.settings.setValue("stardb_cookie", self.lineEditStarDBCookie.text().strip())
         self.settings.setValue("nav_delay", self.spinBoxNavDelay.value())
         self.settings.setValue("scan_delay", self.spinBoxScanDelay.value())
         self.settings.setValue("scanner", self.comboBoxScanner.currentIndex())
@@ -120,6 +181,9 @@ class ScannerUI(QtWidgets.QMainWindow, Ui_MainWindow):
         self.settings.setValue("nav_delay", 0)
         self.settings.setValue("scan_delay", 0)
         self.settings.setValue("debug_mode", False)
+        self.settings.setValue("delta_scan", False)
+        self.settings.setValue("parallel_ocr", False)
+        self.settings.setValue("timings", False)
         self.settings.setValue("scanner", 0)
         self.settings.setValue("language", 0)
         self.load_settings()
@@ -152,10 +216,9 @@ class ScannerUI(QtWidgets.QMainWindow, Ui_MainWindow):
 
         # initialize scanner
         try:
-            scanner = HSRScanner(self.get_config(), self.game_data, method=method, lang=lang)
-            scanner.log_signal.connect(self.log)
-            scanner.update_signal.connect(self.increment_progress)
-            scanner.complete_signal.connect(self._listener.stop)
+            scanner = HSRScanner(
+                self.get_config(), self.game_data, method=method, lang=lang, listener=self._scanner_events
+            )
         except Exception as e:
             self.log(str(e))
             self.enable_start_scan_button()
@@ -163,12 +226,17 @@ class ScannerUI(QtWidgets.QMainWindow, Ui_MainWindow):
 
         # initialize thread
         self._scanner_thread = ScannerThread(scanner)
-        self._scanner_thread.log_signal.connect(self.log)
+        self._scanner_thread.log_signal.connect(
+            self._scanner_events.log, QtCore.Qt.ConnectionType.DirectConnection
+        )
 
+        self._scanner_thread.result_signal.connect(self._scanner_events.stop)
         self._scanner_thread.result_signal.connect(self.handle_result)
         self._scanner_thread.result_signal.connect(self._scanner_thread.deleteLater)
         self._scanner_thread.result_signal.connect(self.enable_start_scan_button)
+        self._scanner_thread.result_signal.connect(self._listener.stop)
 
+        self._scanner_thread.error_signal.connect(self._scanner_events.stop)
         self._scanner_thread.error_signal.connect(self.log)
         self._scanner_thread.error_signal.connect(self._scanner_thread.deleteLater)
         self._scanner_thread.error_signal.connect(self.enable_start_scan_button)
@@ -177,6 +245,7 @@ class ScannerUI(QtWidgets.QMainWindow, Ui_MainWindow):
         self._listener.interrupt_signal.connect(self._scanner_thread.interrupt_scan)
 
         # start thread
+        self._scanner_events.start()
         self._scanner_thread.started.connect(self._listener.start)
         self._scanner_thread.start()
 
@@ -191,6 +260,27 @@ class ScannerUI(QtWidgets.QMainWindow, Ui_MainWindow):
         config["nav_delay"] = self.spinBoxNavDelay.value() / 1000
         config["scan_delay"] = self.spinBoxScanDelay.value() / 1000
 
+        # OCR worker processes, the scan is pipelined when there is more than one
+        config["workers"] = default_workers() if self.checkBoxParallelOcr.isChecked() else 1
+
+        # cache of the rows matched in previous scans
+        config["cache_location"] = os.path.join(self.lineEditOutputLocation.text(), "cache")
+
+        # time the scan stages
+        config["timings"] = self.checkBoxTimings.isChecked()
+
+        # delta scan from the last result, only if asked for
+        config["previous_scan"] = None
+        if self.checkBoxDeltaScan.isChecked():
+            config["previous_scan"] = find_latest_scan(self.lineEditOutputLocation.text())
+
+        # journal of the scan, resumed if the last scan did not finish and the user agrees
+        config["journal"] = os.path.join(self.lineEditOutputLocation.text(), JOURNAL_FILE)
+        config["resume"] = self.ask_resume(config["journal"])
+
+        # where the last frames are saved if the scan fails, when not in debug mode
+        config["flight_recorder_location"] = self.lineEditOutputLocation.text()
+
         # debug mode
         config["debug"] = self.checkBoxDebugMode.isChecked()
         config["debug_output_location"] = ""
@@ -206,25 +296,63 @@ class ScannerUI(QtWidgets.QMainWindow, Ui_MainWindow):
 
         return config
 
+    def ask_resume(self, journal: str) -> bool:
+        """Ask the user whether to resume the last scan, if it did not finish and is recent enough to resume
+
+        :param journal: The journal file of the last scan
+        :return: Whether to resume it
+        """
+        resume = load_journal(journal, self.game_data.version)
+        if resume is None:
+            return False
+        start_tab, entries = resume
+        answer = QtWidgets.QMessageBox.question(
+            self.centralwidget,
+            "Resume scan",
+            f"The last scan stopped in tab {start_tab}, after finding {len(entries)} achievements.\n"
+            f"Resume it? Achievements completed since then in the finished tabs will be missed.",
+        )
+        return answer == QtWidgets.QMessageBox.StandardButton.Yes
+
     def handle_result(self, data: dict) -> None:
         """Handles the result of the scan
 
         :param data: The data from the scan
         """
         output_location = self.lineEditOutputLocation.text()
-        file_name = (
-            f"HSRScanData_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        )
-        save_to_json(data, output_location, file_name)
+        save_scan_result(data, output_location)
         self.log("Scan complete. Data saved to " + output_location)
+        cookie = self.lineEditStarDBCookie.text().strip()
+        if cookie:
+            self.upload_to_stardb(cookie, data["achievements"])
+
+    def upload_to_stardb(self, cookie: str, achievements: list[int]) -> None:
+        """Uploads the result of the scan to stardb.gg in a separate thread
+
+        :param cookie: The value of the stardb.gg id cookie
+        :param achievements: The IDs of the completed achievements
+        """
+        self.log("Uploading to stardb.gg...")
+        upload_thread = StarDBUploadThread(cookie, achievements, parent=self)
+        upload_thread.result_signal.connect(
+            lambda uploaded: self.log(f"Uploaded {len(uploaded)} new achievements to stardb.gg")
+        )
+        upload_thread.error_signal.connect(lambda e: self.log(f"Upload to stardb.gg failed: {e}"))
+        upload_thread.finished.connect(upload_thread.deleteLater)
+        upload_thread.start()
 
     def increment_progress(self, tab: int) -> None:
         """Increments the number on the UI based on the enum
 
         :param tab: The tab to increment the progress for
         """
-        if tab < 1 or tab > 9:
-            self.log("Error in increment_progress: tab not between 1 and 9.")
+        self.add_progress({tab: 1})
+
+    def add_progress(self, counts: dict[int, int]) -> None:
+        """Adds to the numbers on the UI
+
+        :param counts: The number of achievements to add, per tab
+        """
         tab_labels = [
             None,
             self.labelAchievementCountProcessed,
@@ -237,7 +365,11 @@ class ScannerUI(QtWidgets.QMainWindow, Ui_MainWindow):
             self.labelAchievementCountProcessed_8,
             self.labelAchievementCountProcessed_9
         ]
-        tab_labels[tab].setText(str(int(tab_labels[tab].text()) + 1))
+        for tab, count in counts.items():
+            if tab < 1 or tab > 9:
+                self.log("Error in add_progress: tab not between 1 and 9.")
+                continue
+            tab_labels[tab].setText(str(int(tab_labels[tab].text()) + count))
 
     def disable_start_scan_button(self) -> None:
         """Disables the start scan button and sets the text to Processing"""
@@ -256,31 +388,137 @@ class ScannerUI(QtWidgets.QMainWindow, Ui_MainWindow):
 
         :param message: The message to log
         """
-        self.textEditLog.appendPlainText(
-            f"[{datetime.datetime.now().strftime('%H:%M:%S')}] > {str(message)}"
-        )
+        self.append_log_lines([format_log_line(message)])
+
+    def append_log_lines(self, lines: list[str]) -> None:
+        """Appends formatted lines to the log box, scrolling once
+
+        :param lines: The lines to append
+        """
+        self.textEditLog.appendPlainText("\n".join(lines))
         self.textEditLog.verticalScrollBar().setValue(self.textEditLog.verticalScrollBar().maximum())
 
 
+def format_log_line(message: str) -> str:
+    """Format a message for the log box
+
+    :param message: The message
+    :return: The message with its time
+    """
+    return f"[{datetime.datetime.now().strftime('%H:%M:%S')}] > {str(message)}"
+
+
+class ScannerEventBuffer(QtCore.QObject, ScanListener):
+    """Collects the logs and progress of the scanner thread, and delivers them to the UI at a fixed rate
+
+    It is the listener of the scanner: log and progress are called in the scanner thread, and only append to the
+    buffer. A timer of the UI thread delivers everything buffered since the last tick at once.
+    """
+
+    def __init__(self, on_log, on_progress, interval: int = UI_REFRESH_INTERVAL, parent=None) -> None:
+        """Constructor
+
+        :param on_log: Called in the UI thread with the buffered log lines
+        :param on_progress: Called in the UI thread with the number of achievements found per tab
+        :param interval: The delivery interval, in milliseconds
+        :param parent: The parent QObject
+        """
+        super().__init__(parent)
+        self._on_log = on_log
+        self._on_progress = on_progress
+        self._lock = threading.Lock()
+        self._lines: list[str] = []
+        self._counts: dict[int, int] = {}
+        self._timer = QtCore.QTimer(self)
+        self._timer.setInterval(interval)
+        self._timer.timeout.connect(self.flush)
+
+    def log(self, message: str) -> None:
+        """Buffer a log message, timed when it is logged
+
+        :param message: The message
+        """
+        line = format_log_line(message)
+        with self._lock:
+            self._lines.append(line)
+
+    def progress(self, tab: int) -> None:
+        """Buffer an achievement found
+
+        :param tab: The tab it is on
+        """
+        with self._lock:
+            self._counts[tab] = self._counts.get(tab, 0) + 1
+
+    def start(self) -> None:
+        """Start delivering"""
+        self._timer.start()
+
+    def stop(self) -> None:
+        """Stop delivering, after delivering what is left"""
+        self._timer.stop()
+        self.flush()
+
+    def flush(self) -> None:
+        """Deliver everything buffered"""
+        with self._lock:
+            lines, self._lines = self._lines, []
+            counts, self._counts = self._counts, {}
+        if counts:
+            self._on_progress(counts)
+        if lines:
+            self._on_log(lines)
+
+
 class FetchGameDataThread(QtCore.QThread):
     """FetchGameDataThread class handles fetching the game data in a separate thread"""
 
     result_signal = QtCore.pyqtSignal(object)
     error_signal = QtCore.pyqtSignal(object)
 
-    def __init__(self) -> None:
-        """Constructor"""
+    def __init__(self, cache_location: str) -> None:
+        """Constructor
+
+        :param cache_location: The folder the game data snapshot is stored in
+        """
         super().__init__()
+        self._cache_location = cache_location
 
     def run(self) -> None:
         """Runs the fetch game data"""
         try:
-            self.result_signal.emit(GameData())
+            self.result_signal.emit(load_game_data(self._cache_location))
             self.quit()
         except Exception as e:
             self.error_signal.emit(e)
 
 
+class StarDBUploadThread(QtCore.QThread):
+    """StarDBUploadThread class uploads the result of a scan to stardb.gg in a separate thread"""
+
+    result_signal = QtCore.pyqtSignal(object)
+    error_signal = QtCore.pyqtSignal(object)
+
+    def __init__(self, cookie: str, achievements: list[int], parent=None) -> None:
+        """Constructor
+
+        :param cookie: The value of the stardb.gg id cookie
+        :param achievements: The IDs of the completed achievements
+        :param parent: The parent QObject
+        """
+        super().__init__(parent)
+        self._cookie = cookie
+        self._achievements = achievements
+
+    def run(self) -> None:
+        """Runs the upload"""
+        try:
+            with StarDBClient(self._cookie) as client:
+                self.result_signal.emit(client.upload(self._achievements))
+        except Exception as e:
+            self.error_signal.emit(e)
+
+
 class InterruptListener(QtCore.QThread):
     """InterruptListener class listens for the enter key to interrupt the scan"""
 
@@ -352,6 +590,8 @@ class ScannerThread(QtCore.QThread):
 if __name__ == "__main__":
     import sys
 
+    multiprocessing.freeze_support()
+
     app = QtWidgets.QApplication(sys.argv)
     app.setWindowIcon(QtGui.QIcon(resource_path("assets/images/app.ico")))
     MainWindow = QtWidgets.QMainWindow()
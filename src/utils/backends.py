@@ -0,0 +1,187 @@
+import time
+
+from PIL import Image
+
+GAME_NAMES = [
+    "Honkai: Star Rail",
+    "崩坏：星穹铁道",
+    "崩壞：星穹鐵道",
+    "붕괴:\u00A0스타레일",
+    "崩壊：スターレイル",
+    "Honkai\u00A0: Star Rail",
+]
+
+BUTTON_DPAD_UP = "DPAD_UP"
+BUTTON_DPAD_DOWN = "DPAD_DOWN"
+BUTTON_RIGHT_SHOULDER = "RIGHT_SHOULDER"
+
+
+class WindowBackend:
+    """Finds the game window and reports its geometry"""
+
+    def find_game(self) -> bool:
+        """Find the game window
+
+        :raises Exception: Thrown if the game is not found
+        :return: Whether the game window has the English title
+        """
+        raise NotImplementedError
+
+    def client_size(self) -> tuple[int, int]:
+        """:return: The width and height of the client area"""
+        raise NotImplementedError
+
+    def client_origin(self) -> tuple[int, int]:
+        """:return: The screen coordinates of the top left corner of the client area"""
+        raise NotImplementedError
+
+    def bring_to_foreground(self, cmd_show: int = 5) -> None:
+        """Bring the game window to the foreground
+
+        :param cmd_show: The command to show the window, defaults to 5
+        """
+        raise NotImplementedError
+
+    def is_foreground(self) -> bool:
+        """:return: Whether the game window is still in the foreground"""
+        raise NotImplementedError
+
+
+class CaptureBackend:
+    """Captures regions of the screen"""
+
+    def grab(self, bbox: tuple[int, int, int, int]) -> Image.Image:
+        """Capture a region of the screen
+
+        :param bbox: The (left, top, right, bottom) screen coordinates of the region
+        :return: The captured image
+        """
+        raise NotImplementedError
+
+
+class InputBackend:
+    """Sends controller inputs to the game"""
+
+    realtime = True  # Whether waiting for the game is needed after an input
+
+    def press(self, button: str) -> None:
+        """Press a button
+
+        :param button: One of the BUTTON_* constants
+        """
+        raise NotImplementedError
+
+    def release(self, button: str) -> None:
+        """Release a button
+
+        :param button: One of the BUTTON_* constants
+        """
+        raise NotImplementedError
+
+    def sleep(self, seconds: float) -> None:
+        """Wait for the game, only if the inputs are sent to a live game
+
+        :param seconds: The time to wait
+        """
+        if self.realtime:
+            time.sleep(seconds)
+
+
+class Clock:
+    """Measures and waits for the time the game takes to react"""
+
+    def now(self) -> float:
+        """:return: The current time, in seconds"""
+        return time.perf_counter()
+
+    def sleep(self, seconds: float) -> None:
+        """Wait
+
+        :param seconds: The time to wait
+        """
+        time.sleep(seconds)
+
+
+class Backends:
+    """The window, capture and input backends a scan runs against, and the clock it waits with"""
+
+    def __init__(self, window: WindowBackend, capture: CaptureBackend, gamepad: InputBackend,
+                 clock: Clock | None = None) -> None:
+        self.window = window
+        self.capture = capture
+        self.gamepad = gamepad
+        self.clock = clock or Clock()
+
+    def close(self) -> None:
+        """Release the backends once the scan is over"""
+
+
+class Win32Window(WindowBackend):
+    """Game window found with win32gui"""
+
+    def __init__(self) -> None:
+        import win32gui
+
+        self._win32gui = win32gui
+        self._hwnd = 0
+
+    def find_game(self) -> bool:
+        for i, game_name in enumerate(GAME_NAMES):
+            self._hwnd = self._win32gui.FindWindow("UnityWndClass", game_name)
+            if self._hwnd:
+                return i == 0
+        raise Exception(
+            "Honkai: Star Rail not found. Please open the game and try again."
+        )
+
+    def client_size(self) -> tuple[int, int]:
+        return tuple(self._win32gui.GetClientRect(self._hwnd)[2:])
+
+    def client_origin(self) -> tuple[int, int]:
+        return self._win32gui.ClientToScreen(self._hwnd, (0, 0))
+
+    def bring_to_foreground(self, cmd_show: int = 5) -> None:
+        self._win32gui.ShowWindow(self._hwnd, cmd_show)
+        self._win32gui.SetForegroundWindow(self._hwnd)
+
+    def is_foreground(self) -> bool:
+        return self._win32gui.GetForegroundWindow() == self._win32gui.FindWindow("UnityWndClass", "Honkai: Star Rail")
+
+
+class ImageGrabCapture(CaptureBackend):
+    """Screen capture with PIL ImageGrab"""
+
+    def __init__(self) -> None:
+        from PIL import ImageGrab
+
+        self._image_grab = ImageGrab
+
+    def grab(self, bbox: tuple[int, int, int, int]) -> Image.Image:
+        return self._image_grab.grab(bbox=bbox, all_screens=True)
+
+
+class VGamepadInput(InputBackend):
+    """Virtual Xbox 360 controller, through vgamepad"""
+
+    def __init__(self) -> None:
+        import vgamepad as vg
+
+        self._gamepad = vg.VX360Gamepad()
+        self._buttons = {
+            BUTTON_DPAD_UP: vg.XUSB_BUTTON.XUSB_GAMEPAD_DPAD_UP,
+            BUTTON_DPAD_DOWN: vg.XUSB_BUTTON.XUSB_GAMEPAD_DPAD_DOWN,
+            BUTTON_RIGHT_SHOULDER: vg.XUSB_BUTTON.XUSB_GAMEPAD_RIGHT_SHOULDER,
+        }
+
+    def press(self, button: str) -> None:
+        self._gamepad.press_button(button=self._buttons[button])
+        self._gamepad.update()
+
+    def release(self, button: str) -> None:
+        self._gamepad.release_button(button=self._buttons[button])
+        self._gamepad.update()
+
+
+def win32_backends() -> Backends:
+    """:return: The backends of a live scan on Windows"""
+    return Backends(Win32Window(), ImageGrabCapture(), VGamepadInput())
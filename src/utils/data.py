@@ -1,3 +1,4 @@
+import glob
 import json
 import os
 import sys
@@ -58,6 +59,32 @@ def save_to_json(data: dict, output_location: str, file_name: str) -> None:
         json.dump(data, outfile, indent=4)
 
 
+def save_scan_result(data: dict, output_location: str) -> str:
+    """Save a scan result, and its stage timings next to it if there are any
+
+    :param data: The scan result, its timings are removed from it
+    :param output_location: The output location
+    :return: The file name of the result
+    """
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    stage_timings = data.pop("timings", None)
+    file_name = f"HSRScanData_{timestamp}.json"
+    save_to_json(data, output_location, file_name)
+    if stage_timings:
+        save_to_json(stage_timings, output_location, f"HSRScanTimings_{timestamp}.json")
+    return file_name
+
+
+def find_latest_scan(output_location: str) -> str | None:
+    """Find the most recent scan result
+
+    :param output_location: The output location
+    :return: The path of the latest HSRScanData file, or None if there is none
+    """
+    scans = sorted(glob.glob(os.path.join(output_location, "HSRScanData_*.json")))
+    return scans[-1] if scans else None
+
+
 def get_json_data(file_path: str) -> dict:
     """Get json data from file
 
@@ -0,0 +1,97 @@
+import datetime
+import io
+import os
+import queue
+import threading
+import zipfile
+
+from PIL import Image
+
+DEBUG_ARCHIVE_FILE = "frames.zip"
+DEBUG_QUEUE_SIZE = 64
+DEBUG_BATCH_SIZE = 16
+DEBUG_PUT_TIMEOUT = 1  # Seconds between two checks that the writer is still running, when waiting for the queue
+POLICY_DROP = "drop"
+POLICY_BLOCK = "block"
+_STOP = object()
+
+
+class DebugImageWriter:
+    """Saves debug images from a background thread, so encoding them never slows down the scan
+
+    Images are queued and written in batches into a single zip archive, as PNG with fast compression. When the queue
+    is full, new images are dropped or the caller waits, depending on the policy. If the writer stops on an error,
+    the images are dropped.
+    """
+
+    def __init__(self, output_location: str, policy: str = POLICY_DROP, queue_size: int = DEBUG_QUEUE_SIZE,
+                 batch_size: int = DEBUG_BATCH_SIZE) -> None:
+        """Constructor
+
+        :param output_location: The folder of the archive
+        :param policy: What to do when the queue is full, POLICY_DROP or POLICY_BLOCK
+        :param queue_size: The maximum number of images waiting to be written
+        :param batch_size: The maximum number of images written between two flushes of the archive
+        :raises ValueError: Thrown if the policy is unknown
+        """
+        if policy not in (POLICY_DROP, POLICY_BLOCK):
+            raise ValueError(f"Unknown debug queue policy {policy}")
+        self._path = os.path.join(output_location, DEBUG_ARCHIVE_FILE)
+        self._policy = policy
+        self._batch_size = batch_size
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._count = 0
+        self.written = 0
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._run, name="DebugImageWriter", daemon=True)
+        self._thread.start()
+
+    def save(self, img: Image.Image) -> None:
+        """Queue an image to be saved
+
+        The image must not be modified afterwards.
+
+        :param img: The image to save
+        """
+        file_name = f"{self._count:06d}_{datetime.datetime.now().strftime('%H%M%S%f')}.png"
+        self._count += 1
+        while self._thread.is_alive():
+            try:
+                if self._policy == POLICY_BLOCK:
+                    self._queue.put((file_name, img), timeout=DEBUG_PUT_TIMEOUT)
+                else:
+                    self._queue.put_nowait((file_name, img))
+                return
+            except queue.Full:
+                if self._policy == POLICY_DROP:
+                    break
+        self.dropped += 1
+
+    def close(self) -> None:
+        """Write the queued images and close the archive"""
+        while self._thread.is_alive():
+            try:
+                self._queue.put(_STOP, timeout=DEBUG_PUT_TIMEOUT)
+                break
+            except queue.Full:
+                pass
+        self._thread.join()
+
+    def _run(self) -> None:
+        with zipfile.ZipFile(self._path, "w", zipfile.ZIP_STORED) as archive:
+            while True:
+                batch = [self._queue.get()]
+                while batch[-1] is not _STOP and len(batch) < self._batch_size:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                for item in batch:
+                    if item is _STOP:
+                        return
+                    file_name, img = item
+                    buffer = io.BytesIO()
+                    img.save(buffer, format="PNG", compress_level=1)
+                    archive.writestr(file_name, buffer.getvalue())
+                    self.written += 1
+                archive.fp.flush()
@@ -0,0 +1,77 @@
+import json
+import os
+import threading
+from collections import deque
+
+import numpy as np
+from PIL import Image
+
+FLIGHT_RECORDER_FRAMES = 8
+FLIGHT_RECORDER_ROWS = 64
+FLIGHT_RECORDER_MAX_DUMPS = 5
+
+
+class FlightRecorder:
+    """Keeps the last frames and row results of a scan in memory, to dump them when something goes wrong
+
+    Memory use is bounded by the number of frames kept. Frames are kept by reference, so they must not be modified
+    once recorded.
+    """
+
+    def __init__(self, frames: int = FLIGHT_RECORDER_FRAMES, rows: int = FLIGHT_RECORDER_ROWS,
+                 max_dumps: int = FLIGHT_RECORDER_MAX_DUMPS) -> None:
+        """Constructor
+
+        :param frames: The number of frames kept
+        :param rows: The number of row results kept
+        :param max_dumps: The maximum number of dumps, so a bad scan does not fill the disk
+        """
+        self._frames: deque[tuple[int, np.ndarray]] = deque(maxlen=frames)
+        self._rows: deque[dict] = deque(maxlen=rows)
+        self._sequence = 0
+        self._max_dumps = max_dumps
+        self.dumps = 0
+        self._lock = threading.Lock()
+
+    def record_frame(self, pixels: np.ndarray) -> int:
+        """Keep a captured frame
+
+        :param pixels: The pixels of the frame
+        :return: The sequence number of the frame, to refer to it in row results
+        """
+        with self._lock:
+            self._sequence += 1
+            self._frames.append((self._sequence, pixels))
+            return self._sequence
+
+    def record_row(self, frame_id: int, tab: int, index: int, **values) -> None:
+        """Keep the result of a row
+
+        :param frame_id: The sequence number of the frame the row was read from
+        :param tab: The tab the row is on
+        :param index: The index of the row in the tab
+        :param values: The OCR strings, match and score of the row
+        """
+        with self._lock:
+            self._rows.append({"frame": frame_id, "tab": tab, "index": index, **values})
+
+    def dump(self, output_location: str, reason: str) -> str | None:
+        """Write the kept frames and row results to disk
+
+        :param output_location: The folder to dump into
+        :param reason: Why the dump was requested
+        :return: The folder of the dump, or None if the maximum number of dumps was reached
+        """
+        with self._lock:
+            if self.dumps >= self._max_dumps:
+                return None
+            self.dumps += 1
+            frames = list(self._frames)
+            rows = list(self._rows)
+        dump_location = os.path.join(output_location, f"flight_recorder_{self.dumps}")
+        os.makedirs(dump_location, exist_ok=True)
+        for frame_id, pixels in frames:
+            Image.fromarray(pixels).save(os.path.join(dump_location, f"frame_{frame_id:06d}.png"), compress_level=1)
+        with open(os.path.join(dump_location, "rows.json"), "w") as rows_file:
+            json.dump({"reason": reason, "rows": rows}, rows_file, indent=4)
+        return dump_location
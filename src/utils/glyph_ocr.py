@@ -0,0 +1,211 @@
+import os
+import threading
+
+import numpy as np
+from PIL import Image
+
+from utils.ocr_preprocess import text_threshold
+
+GLYPH_ATLAS_FORMAT = 2  # Bump when the glyph vectors change, stored atlases are dropped
+GLYPH_HEIGHT = 32  # Rows kept from the top of the text, the title font fits in them
+GLYPH_WIDTH = 32  # Columns of a glyph, wider segments are touching glyphs
+GLYPH_POOL = 2  # Glyphs are summed over pool x pool blocks, so a pixel of jitter barely changes them
+GLYPH_MIN_PIXELS = 2  # Smaller segments are specks of the background
+GLYPH_MASK_STRIDE = 2  # The text threshold and box are found on a quarter of the pixels
+GLYPH_CHANNEL = 1  # Green carries most of the luminance, reading it alone is much cheaper than a grey conversion
+GLYPH_BOX_MARGIN = 4  # Pixels added around the text box of the subsample, for strokes between its pixels
+GLYPH_MAX_SAMPLES = 20  # Crops averaged into a glyph template, later ones are not learned
+DEFAULT_SPACE_GAP = 8  # Gap between two words, in pixels, until it is learned
+
+
+class GlyphRecognizer:
+    """Reads achievement titles by matching their glyphs with templates, as they are always drawn in the same font
+
+    The glyphs are the runs of text columns of the name crop. Each glyph is correlated with the templates of the
+    atlas in one matrix product. The atlas is learned from the name crops of the rows matched with a high score,
+    whose title gives the character of each glyph. Titles whose glyph count does not match their length, because
+    of touching glyphs, are not learned. Crops with a glyph that is not a clear match are left to the OCR.
+    """
+
+    MIN_CORRELATION = 0.85
+
+    def __init__(self, path: str = "", lang: str = "en") -> None:
+        """Constructor
+
+        :param path: The file the atlas is stored in, in memory only if empty
+        :param lang: language code, the atlas is dropped if it was saved with another one
+        """
+        self._path = path
+        self._lang = lang
+        self._templates: dict[str, np.ndarray] = {}
+        self._template_counts: dict[str, int] = {}
+        self._gap_sums = {False: [0., 0], True: [0., 0]}  # Sum and count of the gaps inside and between words
+        self._chars = ""
+        self._matrix: np.ndarray | None = None
+        self._dirty = False
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            try:
+                self._load(path)
+            except (OSError, ValueError, KeyError):
+                self._templates.clear()
+                self._template_counts.clear()
+
+    def __len__(self) -> int:
+        return len(self._templates)
+
+    def _load(self, path: str) -> None:
+        with np.load(path) as stored:
+            if int(stored["format"]) != GLYPH_ATLAS_FORMAT or str(stored["lang"]) != self._lang:
+                return
+            for char, template, count in zip(str(stored["chars"]), stored["templates"], stored["counts"]):
+                self._templates[char] = template
+                self._template_counts[char] = int(count)
+            for between_words, (total, count) in zip((False, True), stored["gaps"]):
+                self._gap_sums[between_words] = [float(total), int(count)]
+
+    @staticmethod
+    def _normalize(pooled: np.ndarray) -> np.ndarray:
+        """Flatten pooled glyphs to zero-mean unit-norm vectors, so their dot product is their correlation
+
+        :param pooled: The pooled glyphs, of shape (n, GLYPH_HEIGHT / GLYPH_POOL, GLYPH_WIDTH / GLYPH_POOL)
+        :return: The vectors, of shape (n, GLYPH_HEIGHT * GLYPH_WIDTH / GLYPH_POOL ** 2)
+        """
+        vectors = pooled.reshape(len(pooled), -1)
+        vectors -= vectors.mean(axis=1, keepdims=True)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-6)
+
+    @staticmethod
+    def _segment(crop: Image.Image | np.ndarray) -> tuple[np.ndarray, np.ndarray] | None:
+        """Split a name crop into glyphs
+
+        :param crop: The name crop
+        :return: The glyph vectors and the gaps between consecutive glyphs, in pixels, or None if the crop is
+            blank or has touching glyphs
+        """
+        pixels = np.asarray(crop)
+        if pixels.ndim == 3:
+            pixels = pixels[..., GLYPH_CHANNEL]
+        sample = pixels[::GLYPH_MASK_STRIDE, ::GLYPH_MASK_STRIDE]
+        split = text_threshold(sample)
+        if split is None:
+            return None
+        threshold, light_text = split
+        # Titles use a fraction of the crop width, only the box around their text is binarized at full resolution
+        sample_mask = (sample > threshold) == light_text
+        rows, columns = np.flatnonzero(sample_mask.any(axis=1)), np.flatnonzero(sample_mask.any(axis=0))
+        if rows.size == 0:
+            return None
+        top = max(int(rows[0]) * GLYPH_MASK_STRIDE - GLYPH_BOX_MARGIN, 0)
+        left = max(int(columns[0]) * GLYPH_MASK_STRIDE - GLYPH_BOX_MARGIN, 0)
+        bottom = int(rows[-1]) * GLYPH_MASK_STRIDE + GLYPH_BOX_MARGIN
+        right = int(columns[-1]) * GLYPH_MASK_STRIDE + GLYPH_BOX_MARGIN
+        mask = (pixels[top:bottom, left:right] > threshold) == light_text
+        rows = np.flatnonzero(mask.any(axis=1))
+        if rows.size == 0:
+            return None
+        mask = mask[rows[0]:rows[0] + GLYPH_HEIGHT]
+        column_pixels = np.count_nonzero(mask, axis=0)
+        edges = np.flatnonzero(np.diff(np.concatenate(([0], column_pixels > 0, [0]))))
+        starts, ends = edges[::2], edges[1::2]
+        pixel_sums = np.concatenate(([0], np.cumsum(column_pixels)))
+        keep = pixel_sums[ends] - pixel_sums[starts] >= GLYPH_MIN_PIXELS
+        starts, ends = starts[keep], ends[keep]
+        if len(starts) == 0 or (ends - starts).max() > GLYPH_WIDTH:
+            return None
+        # The glyphs share their rows, so the text is pooled once, and each glyph gathers the pooled blocks
+        # starting at its columns. The columns past a glyph are zeroed, the one just past it is always blank.
+        strip = np.zeros((GLYPH_HEIGHT, mask.shape[1] + GLYPH_WIDTH), dtype=np.float32)
+        strip[:mask.shape[0], :mask.shape[1]] = mask
+        strip = strip.reshape(GLYPH_HEIGHT // GLYPH_POOL, GLYPH_POOL, -1).sum(axis=1)
+        block_count = strip.shape[1] - GLYPH_POOL + 1
+        blocks = sum(strip[:, i:i + block_count] for i in range(GLYPH_POOL))
+        offsets = np.arange(0, GLYPH_WIDTH, GLYPH_POOL)
+        pooled = blocks[:, starts[:, np.newaxis] + offsets] * (offsets < (ends - starts)[:, np.newaxis])
+        return GlyphRecognizer._normalize(pooled.transpose(1, 0, 2)), starts[1:] - ends[:-1]
+
+    @property
+    def space_gap(self) -> float:
+        """:return: The smallest gap between two glyphs read as a space"""
+        (letter_total, letters), (word_total, words) = self._gap_sums[False], self._gap_sums[True]
+        if not letters or not words:
+            return DEFAULT_SPACE_GAP
+        return (letter_total / letters + word_total / words) / 2
+
+    def read(self, crop: Image.Image | np.ndarray) -> str | None:
+        """Read a name crop
+
+        :param crop: The name crop
+        :return: The text, or None if a glyph is not a clear match
+        """
+        with self._lock:
+            if not self._templates:
+                return None
+            if self._matrix is None:
+                self._chars = "".join(self._templates)
+                self._matrix = np.stack(list(self._templates.values()))
+            chars, matrix, space_gap = self._chars, self._matrix, self.space_gap
+        segments = self._segment(crop)
+        if segments is None:
+            return None
+        vectors, gaps = segments
+        correlations = vectors @ matrix.T
+        best = correlations.argmax(axis=1)
+        if correlations[np.arange(len(best)), best].min() < self.MIN_CORRELATION:
+            return None
+        text = chars[best[0]]
+        for gap, glyph in zip(gaps, best[1:]):
+            text += (" " if gap >= space_gap else "") + chars[glyph]
+        return text
+
+    def learn(self, crop: Image.Image | np.ndarray, title: str) -> bool:
+        """Add the glyphs of a name crop to the templates of the characters of its title
+
+        :param crop: The name crop
+        :param title: The title of the achievement the row was matched to
+        :return: Whether the crop was learned
+        """
+        chars = title.replace(" ", "")
+        if all(self._template_counts.get(char, 0) >= GLYPH_MAX_SAMPLES for char in chars):
+            return False
+        segments = self._segment(crop)
+        if segments is None or len(segments[0]) != len(chars):
+            return False
+        vectors, gaps = segments
+        words = title.split()
+        spaces = np.zeros(len(chars), dtype=bool)
+        spaces[np.cumsum([len(word) for word in words])[:-1]] = True
+        with self._lock:
+            for char, vector in zip(chars, vectors):
+                count = self._template_counts.get(char, 0)
+                if count >= GLYPH_MAX_SAMPLES:
+                    continue
+                template = vector if count == 0 else (self._templates[char] * count + vector) / (count + 1)
+                self._templates[char] = template / max(float(np.linalg.norm(template)), 1e-6)
+                self._template_counts[char] = count + 1
+            for gap, between_words in zip(gaps, spaces[1:]):
+                self._gap_sums[bool(between_words)][0] += float(gap)
+                self._gap_sums[bool(between_words)][1] += 1
+            self._matrix = None
+            self._dirty = True
+        return True
+
+    def save(self) -> None:
+        """Write the atlas to disk if it changed"""
+        with self._lock:
+            if not self._dirty or not self._path:
+                return
+            chars = "".join(self._templates)
+            templates = np.stack(list(self._templates.values()))
+            counts = np.array([self._template_counts[char] for char in chars])
+            gaps = np.array([self._gap_sums[False], self._gap_sums[True]], dtype=np.float64)
+            self._dirty = False
+        os.makedirs(os.path.dirname(self._path) or ".", exist_ok=True)
+        tmp_path = self._path + ".tmp"
+        with open(tmp_path, "wb") as atlas_file:
+            np.savez(
+                atlas_file, format=GLYPH_ATLAS_FORMAT, lang=self._lang, chars=chars, templates=templates,
+                counts=counts, gaps=gaps,
+            )
+        os.replace(tmp_path, self._path)
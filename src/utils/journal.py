@@ -0,0 +1,109 @@
+import json
+import os
+import time
+
+JOURNAL_FILE = "HSRScanJournal.jsonl"
+JOURNAL_SYNC_ENTRIES = 16  # Entries written between two fsyncs at most
+JOURNAL_SYNC_INTERVAL = 1.  # Seconds between two fsyncs at most
+JOURNAL_MAX_AGE = 24 * 60 * 60  # Seconds after which an unfinished scan is not resumed, achievements may have changed
+
+
+class ScanJournal:
+    """Append-only JSON lines journal of the achievements found during a scan, so a crashed scan can be resumed
+
+    The first line holds the game data version and the start time of the scan. Each following line is either an
+    achievement with the (tab, index) cursor of its row, or the end of a tab. Lines are flushed to disk in batches,
+    and the end of a tab is always flushed.
+    """
+
+    def __init__(self, path: str, append: bool = False, version: str = "") -> None:
+        """Constructor
+
+        :param path: The journal file
+        :param append: Whether to keep the entries of the scan being resumed, the file is truncated otherwise
+        :param version: The version of the game data of the scan
+        """
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._file = open(path, "a" if append else "w", encoding="utf-8")
+        self._pending = 0
+        self._last_sync = time.monotonic()
+        if not append:
+            self._write({"version": version, "started": time.time()})
+            self.sync()
+
+    def record(self, chive_id: int, tab: int, index: int, name_hash: str = "") -> None:
+        """Append an achievement
+
+        :param chive_id: The achievement ID
+        :param tab: The tab it is on
+        :param index: The index of its row in the tab, -1 if it was not read from the screen
+        :param name_hash: The text digest of the name crop of its row, to recognize the row when resuming
+        """
+        self._write({"id": chive_id, "tab": tab, "index": index, "hash": name_hash})
+        self._pending += 1
+        if self._pending >= JOURNAL_SYNC_ENTRIES or time.monotonic() - self._last_sync >= JOURNAL_SYNC_INTERVAL:
+            self.sync()
+
+    def end_tab(self, tab: int) -> None:
+        """Append the end of a tab
+
+        :param tab: The finished tab
+        """
+        self._write({"tab_done": tab})
+        self.sync()
+
+    def sync(self) -> None:
+        """Flush the journal to disk"""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def close(self, finished: bool = False) -> None:
+        """Close the journal
+
+        :param finished: Whether the scan went through every tab, the journal is deleted if so
+        """
+        if self._file.closed:
+            return
+        self.sync()
+        self._file.close()
+        if finished:
+            os.remove(self.path)
+
+    def _write(self, entry: dict) -> None:
+        self._file.write(json.dumps(entry) + "\n")
+
+
+def load_journal(path: str, version: str = "", max_age: float = JOURNAL_MAX_AGE) -> tuple[int, list[dict]] | None:
+    """Load the journal of an unfinished scan
+
+    A truncated last line, left by a crash while writing it, is ignored. A journal of other game data, or older
+    than max_age, is not resumed: achievements may have been completed since in the tabs it had finished.
+
+    :param path: The journal file
+    :param version: The version of the current game data
+    :param max_age: The age of the oldest journal to resume, in seconds
+    :return: The first unfinished tab and the achievement entries, or None if there is no journal to resume
+    """
+    if not os.path.exists(path):
+        return None
+    header: dict | None = None
+    tabs_done = 0
+    entries: list[dict] = []
+    with open(path, encoding="utf-8") as journal_file:
+        for line in journal_file:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if header is None:
+                header = entry
+            elif "tab_done" in entry:
+                tabs_done = max(tabs_done, entry["tab_done"])
+            else:
+                entries.append(entry)
+    if header is None or header.get("version") != version or time.time() - header.get("started", 0) > max_age:
+        return None
+    return tabs_done + 1, entries
@@ -0,0 +1,100 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+
+from utils.ocr_preprocess import text_mask
+
+MATCH_CACHE_FORMAT = 2  # Bump when the row digests change, stored caches are dropped
+
+
+def text_digest(img: Image.Image | np.ndarray) -> str:
+    """Compute a digest of the text of a crop, binarized and cropped to its bounding box
+
+    Unlike a perceptual hash, two different titles never share a digest, while the background and the position
+    of the text in the crop do not change it.
+
+    :param img: The crop
+    :return: The SHA-1 digest, as a hex string, or an empty string if the crop is blank
+    """
+    mask = text_mask(np.asarray(img))
+    if mask is None:
+        return ""
+    rows, columns = np.flatnonzero(mask.any(axis=1)), np.flatnonzero(mask.any(axis=0))
+    text = mask[rows[0]:rows[-1] + 1, columns[0]:columns[-1] + 1]
+    digest = hashlib.sha1(np.array(text.shape, dtype=np.int32).tobytes())
+    digest.update(np.packbits(text).tobytes())
+    return digest.hexdigest()
+
+
+class MatchCache:
+    """Disk-backed LRU cache mapping the text digest of a name crop to an achievement ID"""
+
+    def __init__(self, path: str, version: str, capacity: int = 5000) -> None:
+        """Constructor
+
+        :param path: The JSON file the cache is stored in
+        :param version: The game data version, the cache is dropped if it was saved with another one or format
+        :param capacity: The maximum number of entries
+        """
+        self._path = path
+        self._version = version
+        self._capacity = capacity
+        self._entries: OrderedDict[str, tuple[int, float]] = OrderedDict()
+        self._dirty = False
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            try:
+                with open(path) as cache_file:
+                    stored = json.load(cache_file)
+                if stored.get("version") == version and stored.get("format") == MATCH_CACHE_FORMAT:
+                    for digest, (c_id, confidence) in stored["entries"]:
+                        self._entries[digest] = (c_id, confidence)
+            except (OSError, ValueError, KeyError, TypeError):
+                self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, digest: str) -> tuple[int, float] | None:
+        """Get the achievement a name crop was matched to
+
+        :param digest: The text digest of the name crop
+        :return: The achievement ID and match confidence, or None if unknown
+        """
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None:
+                self._entries.move_to_end(digest)
+            return entry
+
+    def put(self, digest: str, c_id: int, confidence: float) -> None:
+        """Remember the achievement a name crop was matched to
+
+        :param digest: The text digest of the name crop
+        :param c_id: The achievement ID
+        :param confidence: The match confidence
+        """
+        with self._lock:
+            self._entries[digest] = (c_id, confidence)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self._capacity:
+                self._entries.popitem(last=False)
+            self._dirty = True
+
+    def save(self) -> None:
+        """Write the cache to disk if it changed"""
+        with self._lock:
+            if not self._dirty:
+                return
+            entries = [[digest, list(entry)] for digest, entry in self._entries.items()]
+            self._dirty = False
+        os.makedirs(os.path.dirname(self._path) or ".", exist_ok=True)
+        tmp_path = self._path + ".tmp"
+        with open(tmp_path, "w") as cache_file:
+            json.dump({"version": self._version, "format": MATCH_CACHE_FORMAT, "entries": entries}, cache_file)
+        os.replace(tmp_path, self._path)
@@ -1,7 +1,6 @@
-import vgamepad as vg
-import time
-
-import win32gui
+from utils.backends import BUTTON_DPAD_DOWN, BUTTON_DPAD_UP, BUTTON_RIGHT_SHOULDER, InputBackend, WindowBackend
+from utils.settle import SettleDetector
+from utils.timing import timings
 
 
 def gcd(a: int, b: int) -> int:
@@ -23,55 +22,104 @@ class Navigation:
     PRESSED_FOR = 0.05
     SCAN_TIME = 0.2
     NAV_TIME = 0.4  # Adjust for low-end PCs, doesn't really impact the overall time
+    SCAN_SETTLE_TIMEOUT = 1.0
+    LIST_END_CONFIRM_DELAY = 0.4
+    NAV_SETTLE_TIMEOUT = 2.0
 
-    def __init__(self, hwnd: int, config: dict) -> None:
-        self._hwnd = hwnd
-        self._width, self._height = win32gui.GetClientRect(self._hwnd)[2:]
+    def __init__(self, window: WindowBackend, gamepad: InputBackend, config: dict) -> None:
+        self._window = window
+        self._width, self._height = self._window.client_size()
         if self._width == 0 or self._height == 0:
             self.bring_window_to_foreground(9)
-            self._width, self._height = win32gui.GetClientRect(self._hwnd)[2:]
-        self._left, self._top = win32gui.ClientToScreen(self._hwnd, (0, 0))
+            self._width, self._height = self._window.client_size()
+        self._left, self._top = self._window.client_origin()
 
         self.NAV_TIME += config["nav_delay"]
         self.SCAN_TIME += config["scan_delay"]
+        self._nav_delay = config["nav_delay"]
+        self._scan_delay = config["scan_delay"]
+        self.settle: SettleDetector | None = None
+
+        self.gamepad = gamepad
+
+    def attach_settle_detector(self, settle: SettleDetector) -> None:
+        """Wait for the screen to settle after each input instead of sleeping for SCAN_TIME and NAV_TIME
 
-        self.gamepad = vg.VX360Gamepad()
+        The user configured delays are still waited for before watching the screen.
+
+        :param settle: The settle detector
+        """
+        self.settle = settle
 
     def bring_window_to_foreground(self, cmd_show: int = 5) -> None:
         """Bring the game window to the foreground
 
         :param cmd_show: The command to show the window, defaults to 5
         """
-        win32gui.ShowWindow(self._hwnd, cmd_show)
-        win32gui.SetForegroundWindow(self._hwnd)
+        self._window.bring_to_foreground(cmd_show)
 
     def wake_up(self) -> None:
-        self.gamepad.press_button(button=vg.XUSB_BUTTON.XUSB_GAMEPAD_DPAD_UP)
-        self.gamepad.update()
-        time.sleep(self.WAKE_WAIT)
-        self.gamepad.release_button(button=vg.XUSB_BUTTON.XUSB_GAMEPAD_DPAD_UP)
-        self.gamepad.update()
-        time.sleep(self.WAKE_WAIT)
-
-    def go_down(self) -> None:
+        self.gamepad.press(BUTTON_DPAD_UP)
+        self.gamepad.sleep(self.WAKE_WAIT)
+        self.gamepad.release(BUTTON_DPAD_UP)
+        self.gamepad.sleep(self.WAKE_WAIT)
+
+    @property
+    def detects_list_end(self) -> bool:
+        """Whether go_down can tell that the list did not move"""
+        return self.settle is not None
+
+    def go_down(self) -> bool | None:
+        """Go down one row
+
+        :return: Whether the list moved, False at the bottom of the list, None if it can't be told
+        """
+        with timings.span("navigation.go_down"):
+            return self._go_down()
+
+    def _go_down(self) -> bool | None:
         if self.gamepad is None:
             raise ValueError('GamepadNotInitialized')
-        self.gamepad.press_button(button=vg.XUSB_BUTTON.XUSB_GAMEPAD_DPAD_DOWN)
-        self.gamepad.update()
-        time.sleep(self.PRESSED_FOR)
-        self.gamepad.release_button(button=vg.XUSB_BUTTON.XUSB_GAMEPAD_DPAD_DOWN)
-        self.gamepad.update()
-        time.sleep(self.SCAN_TIME)  # to wait to go down
+        if self.settle:
+            self.settle.mark()
+        self.gamepad.press(BUTTON_DPAD_DOWN)
+        self.gamepad.sleep(self.PRESSED_FOR)
+        self.gamepad.release(BUTTON_DPAD_DOWN)
+        if self.settle:
+            self.settle.wait("go_down", self.SCAN_SETTLE_TIMEOUT, self._scan_delay)
+            return self.settle.moved
+        self.gamepad.sleep(self.SCAN_TIME)  # to wait to go down
+        return None
+
+    def confirm_list_end(self) -> bool:
+        """Confirm that the list did not move after go_down returned False
+
+        The screen is checked again after a while, in case the game reacted late. If it still did not move, down is
+        pressed again: a lost input looks like the bottom of the list, and pressing again then only goes to the row
+        the first input was meant for.
+
+        :return: Whether the bottom of the list was reached
+        """
+        if self.settle is None or self.settle.changed_late(self.LIST_END_CONFIRM_DELAY):
+            return False
+        return self.go_down() is False
 
     def change_tab(self) -> None:
+        with timings.span("navigation.change_tab"):
+            self._change_tab()
+
+    def _change_tab(self) -> None:
         if self.gamepad is None:
             raise ValueError('GamepadNotInitialized')
-        self.gamepad.press_button(button=vg.XUSB_BUTTON.XUSB_GAMEPAD_RIGHT_SHOULDER)
-        self.gamepad.update()
-        time.sleep(self.PRESSED_FOR)
-        self.gamepad.release_button(button=vg.XUSB_BUTTON.XUSB_GAMEPAD_RIGHT_SHOULDER)
-        self.gamepad.update()
-        time.sleep(self.NAV_TIME)  # to wait for the tab to load
+        if self.settle:
+            self.settle.mark()
+        self.gamepad.press(BUTTON_RIGHT_SHOULDER)
+        self.gamepad.sleep(self.PRESSED_FOR)
+        self.gamepad.release(BUTTON_RIGHT_SHOULDER)
+        if self.settle:
+            self.settle.wait("change_tab", self.NAV_SETTLE_TIMEOUT, self._nav_delay)
+        else:
+            self.gamepad.sleep(self.NAV_TIME)  # to wait for the tab to load
 
     def get_aspect_ratio(self) -> str:
         """Get the aspect ratio of the game window
@@ -0,0 +1,70 @@
+import heapq
+import re
+from collections import defaultdict
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize(text: str) -> str:
+    """Normalize a string for n-gram indexing
+
+    :param text: The string to normalize
+    :return: The lowercased string with collapsed whitespace
+    """
+    return _WHITESPACE.sub(" ", text.lower()).strip()
+
+
+def ngrams(text: str, n: int = 3) -> set[str]:
+    """Get the set of character n-grams of a normalized string
+
+    The string is padded with spaces so that short strings and word boundaries still produce n-grams.
+
+    :param text: The normalized string
+    :param n: The n-gram size
+    :return: The set of n-grams
+    """
+    padded = f" {text} "
+    if len(padded) < n:
+        return {padded}
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+class NGramIndex:
+    """Character n-gram inverted index used to narrow down fuzzy string lookups"""
+
+    def __init__(self, strings: list[str], n: int = 3) -> None:
+        """Constructor
+
+        :param strings: The strings to index, their position in the list is their key
+        :param n: The n-gram size
+        """
+        self._n = n
+        self._sizes: list[int] = []
+        self._postings: dict[str, list[int]] = defaultdict(list)
+        for key, string in enumerate(strings):
+            grams = ngrams(normalize(string), n)
+            self._sizes.append(len(grams))
+            for gram in grams:
+                self._postings[gram].append(key)
+
+    def __len__(self) -> int:
+        return len(self._sizes)
+
+    def candidates(self, query: str, k: int = 32) -> list[int]:
+        """Get the keys of the indexed strings sharing the most n-grams with the query
+
+        Candidates are scored with the Dice coefficient of their n-gram sets.
+
+        :param query: The string to look up
+        :param k: The maximum number of candidates to return
+        :return: The keys of the best candidates, best first
+        """
+        grams = ngrams(normalize(query), self._n)
+        shared: dict[int, int] = defaultdict(int)
+        for gram in grams:
+            for key in self._postings.get(gram, ()):
+                shared[key] += 1
+        if not shared:
+            return []
+        size = len(grams)
+        return heapq.nlargest(k, shared, key=lambda key: 2 * shared[key] / (size + self._sizes[key]))
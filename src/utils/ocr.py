@@ -1,53 +1,98 @@
 import Levenshtein
 import numpy as np
 from PIL import Image
-import pytesseract
 from config.screenshot import *
 
-from utils.screenshot import Screenshot
+from utils.glyph_ocr import GlyphRecognizer
+from utils.ocr_engine import engine_pool
+from utils.ocr_preprocess import preprocess_for_ocr
+from utils.screenshot import Frame
+from utils.status_classifier import CLAIMABLE, COMPLETED, UNCOMPLETED, StatusClassifier
+from utils.timing import timings
 
 
 def image_to_string(img: Image, whitelist=None, method="tesseract", lang="en", psm=7) -> str:
-    if method == "tesseract":
-        return image_to_string_tesseract(img, psm=psm, whitelist=whitelist, lang=lang)
-    else:
-        raise ValueError("Not using a valid OCR model!")
+    return image_to_strings([img], whitelist=whitelist, method=method, lang=lang, psm=psm)[0]
+
+
+def image_to_strings(imgs: list[Image.Image | np.ndarray], whitelist=None, method="tesseract", lang="en",
+                     psm=7) -> list[str]:
+    """Read several single line crops in one call to the OCR engine
+
+    :param imgs: The crops
+    :param whitelist: The characters Tesseract is allowed to output, all of them if None
+    :param method: The OCR method
+    :param lang: language code
+    :param psm: Tesseract page segmentation mode
+    :raises ValueError: Thrown if the OCR method is unknown
+    :return: The text of each crop
+    """
+    engine = engine_pool.get(method, lang, psm, whitelist)
+    with timings.span(f"ocr.{method}"):
+        return engine.recognize(imgs)
 
 
 def image_to_string_tesseract(img: Image, psm=7, whitelist=None, lang="en") -> str:
-    if whitelist:
-        config = f'-c tessedit_char_whitelist="{whitelist}" --psm {psm} -l hsr3-{lang}'
-    else:
-        config = f'--psm {psm} -l hsr3-{lang}'
-    return pytesseract.image_to_string(img, config=config).replace("\n", " ").strip()
+    return image_to_string(img, whitelist=whitelist, method="tesseract", lang=lang, psm=psm)
+
+
+def _read_text_strips(imgs: list[Image.Image | np.ndarray], method: str, lang: str) -> list[str]:
+    with timings.span("ocr.preprocess"):
+        clean = [preprocess_for_ocr(np.asarray(img)) for img in imgs]
+    texts = iter(image_to_strings([img for img in clean if img is not None], method=method, lang=lang))
+    return ["" if img is None else next(texts) for img in clean]
+
+
+def _read_text_strip(img: Image.Image | np.ndarray, method: str, lang: str) -> str:
+    return _read_text_strips([img], method, lang)[0]
+
+
+def get_achievement_names(rows: list[int], frame: Frame, method="tesseract", lang="en") -> list[str]:
+    """Read the names of several rows of a frame with one call to the OCR engine
+
+    :param rows: The indexes of the rows
+    :param frame: The frame the rows are on
+    :param method: The OCR method
+    :param lang: language code
+    :return: The name of each row
+    """
+    return _read_text_strips([frame.name(index) for index in rows], method, lang)
+
+
+def _read_title(img: Image.Image | np.ndarray, method: str, lang: str, glyphs: GlyphRecognizer) -> str:
+    with timings.span("ocr.glyphs"):
+        text = glyphs.read(img)
+    return text if text is not None else _read_text_strip(img, method, lang)
 
 
-def get_achievement_name(index: int, screenshotter: Screenshot, method="tesseract", lang="en") -> str:  # index starts at 0
-    index = min(index, 4)
-    img = screenshotter.take_screenshot(NAME_X, NAME_Y[index], NAME_X_END - NAME_X, FONT_HEIGHT)
-    return image_to_string(img, method=method, lang=lang)
+def get_achievement_name(index: int, frame: Frame, method="tesseract", lang="en",
+                         glyphs: GlyphRecognizer | None = None) -> str:  # index starts at 0
+    if glyphs is None:
+        return _read_text_strip(frame.name(index), method, lang)
+    return _read_title(frame.name(index), method, lang, glyphs)
 
 
-def get_achievement_desc(index: int, screenshotter: Screenshot, method="tesseract", lang="en") -> str:
-    index = min(index, 4)
-    img = screenshotter.take_screenshot(NAME_X, NAME_Y[index] + DESC_SHIFT_Y, NAME_X_END - NAME_X, FONT_HEIGHT)
-    return image_to_string(img, method=method, lang=lang)
+def get_achievement_desc(index: int, frame: Frame, method="tesseract", lang="en") -> str:
+    return _read_text_strip(frame.desc(index), method, lang)
 
 
-def get_completed_status(index: int, screenshotter: Screenshot, method="tesseract", lang="en") -> tuple[bool, bool]:
-    index = min(index, 4)
-    img = screenshotter.take_screenshot(COMPLETED_X, COMPLETED_Y[index], COMPLETED_X_END - COMPLETED_X, FONT_HEIGHT)
+def get_completed_status(index: int, frame: Frame, method="tesseract", lang="en",
+                         classifier: StatusClassifier | None = None, status: str | None = None) -> tuple[bool, bool]:
+    if status is not None:
+        return status != UNCOMPLETED, status == CLAIMABLE
+    img = frame.completed(index)
     # Check if unclaimed
     x, y = CLAIM_BOX_SHIFT_AFTER_RESIZE[0], CLAIM_BOX_SHIFT_AFTER_RESIZE[1]
     z, t = CLAIM_BOX_SHIFT_AFTER_RESIZE[2], CLAIM_BOX_SHIFT_AFTER_RESIZE[3]
-    arr = np.array(img)
-    area = arr[y:t, x:z, :]
+    area = img[y:t, x:z, :]
     average_color = np.mean(area, axis=(0, 1))
     color_distance = np.sqrt(np.sum((average_color - np.array([0xFF, 0xC7, 0x59])) ** 2))
     if color_distance < 5:  # Arbitrary value, can induce bugs ?
         return True, True
     # Check if "Completed"
     calc_ratio = Levenshtein.ratio(image_to_string(img, whitelist='Completed', method=method, lang=lang), 'Completed')
+    if classifier is not None:
+        classifier.learn(img, COMPLETED if calc_ratio >= 0.8 else UNCOMPLETED)
     return calc_ratio >= 0.8, False
 
 
@@ -0,0 +1,247 @@
+import importlib.util
+import os
+import threading
+
+import numpy as np
+from PIL import Image
+
+from utils.data import resource_path
+
+TESSDATA_PATH = resource_path("assets/tesseract/tessdata")
+TESSERACT_CMD = resource_path("assets/tesseract/tesseract.exe")
+
+OCR_ENGINES: dict[str, type["OCREngine"]] = {}
+
+
+def register_engine(name: str):
+    """Register an OCR engine class under the name used to select it
+
+    :param name: The OCR method name
+    :return: The class decorator
+    """
+    def decorator(cls: type["OCREngine"]) -> type["OCREngine"]:
+        cls.name = name
+        OCR_ENGINES[name] = cls
+        return cls
+    return decorator
+
+
+def available_engines() -> list[str]:
+    """:return: The names of the OCR engines whose dependencies are installed"""
+    return [name for name, cls in OCR_ENGINES.items() if cls.available()]
+
+
+def _to_pixels(crop: Image.Image | np.ndarray, mode: str = "L") -> np.ndarray:
+    if isinstance(crop, np.ndarray):
+        crop = Image.fromarray(crop)
+    return np.asarray(crop.convert(mode))
+
+
+def _stack_lines(lines: list[np.ndarray], background: int = 255) -> tuple[np.ndarray, list[tuple[int, int, int, int]]]:
+    """Stack single line crops vertically on one canvas
+
+    :param lines: The greyscale crops
+    :param background: The value of the padding
+    :return: The canvas, and the (left, right, top, bottom) box of each crop on it
+    """
+    width = max(line.shape[1] for line in lines)
+    canvas = np.full((sum(line.shape[0] for line in lines), width), background, dtype=np.uint8)
+    boxes = []
+    top = 0
+    for line in lines:
+        height, line_width = line.shape
+        canvas[top:top + height, :line_width] = line
+        boxes.append((0, line_width, top, top + height))
+        top += height
+    return canvas, boxes
+
+
+class OCREngine:
+    """Reads the text of single line crops, a whole batch in one call
+
+    Engines are long-lived, loaded once per configuration by the EnginePool. The page segmentation mode and the
+    whitelist are Tesseract options, the other engines ignore them.
+    """
+
+    name = ""
+    tesseract_options = False  # Whether psm and whitelist change the results
+
+    def __init__(self, lang: str = "en", psm: int = 7, whitelist: str | None = None) -> None:
+        """Constructor
+
+        :param lang: language code
+        :param psm: Tesseract page segmentation mode
+        :param whitelist: The characters Tesseract is allowed to output, all of them if None
+        """
+        self._lang = lang
+        self._lock = threading.Lock()
+
+    @classmethod
+    def available(cls) -> bool:
+        """:return: Whether the dependencies of the engine are installed"""
+        return True
+
+    def recognize(self, crops: list[Image.Image | np.ndarray]) -> list[str]:
+        """Read the text of several crops
+
+        :param crops: The crops to read
+        :return: The text of each crop, on a single line
+        """
+        if not crops:
+            return []
+        with self._lock:
+            return [text.replace("\n", " ").strip() for text in self._recognize_batch(crops)]
+
+    def _recognize_batch(self, crops: list[Image.Image | np.ndarray]) -> list[str]:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Release the engine"""
+
+
+@register_engine("tesseract")
+class TesseractEngine(OCREngine):
+    """Long-lived Tesseract engine, with its traineddata loaded once for a (lang, psm, whitelist) configuration"""
+
+    tesseract_options = True
+
+    def __init__(self, lang: str = "en", psm: int = 7, whitelist: str | None = None) -> None:
+        """Constructor
+
+        :param lang: language code
+        :param psm: Tesseract page segmentation mode
+        :param whitelist: The characters Tesseract is allowed to output, all of them if None
+        """
+        super().__init__(lang, psm, whitelist)
+        self._psm = psm
+        self._whitelist = whitelist
+        self._api = None
+        self._pytesseract = None
+        try:  # In-process Tesseract API, falls back to pytesseract subprocesses if missing
+            import tesserocr
+        except ImportError:
+            import pytesseract
+
+            if os.path.exists(TESSERACT_CMD):
+                pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
+            self._pytesseract = pytesseract
+        else:
+            self._api = tesserocr.PyTessBaseAPI(
+                path=TESSDATA_PATH, lang=f"hsr3-{lang}", psm=tesserocr.PSM(psm)
+            )
+            if whitelist:
+                self._api.SetVariable("tessedit_char_whitelist", whitelist)
+
+    @classmethod
+    def available(cls) -> bool:
+        return any(importlib.util.find_spec(module) is not None for module in ("tesserocr", "pytesseract"))
+
+    @staticmethod
+    def in_process() -> bool:
+        """:return: Whether Tesseract runs in process, and not as one pytesseract subprocess per crop"""
+        return importlib.util.find_spec("tesserocr") is not None
+
+    def _recognize_batch(self, crops: list[Image.Image | np.ndarray]) -> list[str]:
+        return [self._recognize_one(crop) for crop in crops]
+
+    def _recognize_one(self, crop: Image.Image | np.ndarray) -> str:
+        if isinstance(crop, np.ndarray):
+            crop = Image.fromarray(crop)
+        if self._api is not None:
+            self._api.SetImage(crop)
+            return self._api.GetUTF8Text()
+        if self._whitelist:
+            config = f'-c tessedit_char_whitelist="{self._whitelist}" --psm {self._psm} -l hsr3-{self._lang}'
+        else:
+            config = f'--psm {self._psm} -l hsr3-{self._lang}'
+        return self._pytesseract.image_to_string(crop, config=config)
+
+    def close(self) -> None:
+        """Release the engine"""
+        if self._api is not None:
+            self._api.End()
+            self._api = None
+
+
+@register_engine("easyocr")
+class EasyOCREngine(OCREngine):
+    """EasyOCR recognizer on the CPU, without its text detector as the crops are single lines already
+
+    The crops of a batch are stacked on one image and recognized as one batch of boxes.
+    """
+
+    def __init__(self, lang: str = "en", psm: int = 7, whitelist: str | None = None) -> None:
+        super().__init__(lang, psm, whitelist)
+        import easyocr
+
+        self._reader = easyocr.Reader([lang], gpu=False, detector=False, verbose=False)
+
+    @classmethod
+    def available(cls) -> bool:
+        return importlib.util.find_spec("easyocr") is not None
+
+    def _recognize_batch(self, crops: list[Image.Image | np.ndarray]) -> list[str]:
+        canvas, boxes = _stack_lines([_to_pixels(crop) for crop in crops])
+        # Boxes are [x_min, x_max, y_min, y_max], the results come back sorted from top to bottom
+        texts = self._reader.recognize(
+            canvas, horizontal_list=[list(box) for box in boxes], free_list=[], detail=0, batch_size=len(crops)
+        )
+        return list(texts) + [""] * (len(crops) - len(texts))
+
+
+@register_engine("doctr")
+class DoctrEngine(OCREngine):
+    """docTR recognition model on the CPU, reading a batch of crops in one forward pass"""
+
+    def __init__(self, lang: str = "en", psm: int = 7, whitelist: str | None = None) -> None:
+        super().__init__(lang, psm, whitelist)
+        from doctr.models import recognition_predictor
+
+        self._predictor = recognition_predictor("crnn_vgg16_bn", pretrained=True, batch_size=64)
+
+    @classmethod
+    def available(cls) -> bool:
+        return importlib.util.find_spec("doctr") is not None
+
+    def _recognize_batch(self, crops: list[Image.Image | np.ndarray]) -> list[str]:
+        return [text for text, _ in self._predictor([_to_pixels(crop, "RGB") for crop in crops])]
+
+
+class EnginePool:
+    """Keeps one engine loaded per (method, lang, psm, whitelist) configuration"""
+
+    def __init__(self) -> None:
+        self._engines: dict[tuple[str, str, int, str | None], OCREngine] = {}
+        self._lock = threading.Lock()
+
+    def get(self, method: str = "tesseract", lang: str = "en", psm: int = 7,
+            whitelist: str | None = None) -> OCREngine:
+        """Get the engine of a configuration, loading it on first use
+
+        :param method: The OCR method
+        :param lang: language code
+        :param psm: Tesseract page segmentation mode
+        :param whitelist: The characters Tesseract is allowed to output, all of them if None
+        :raises ValueError: Thrown if the OCR method is unknown
+        :return: The engine
+        """
+        if method not in OCR_ENGINES:
+            raise ValueError(f"Unknown OCR method {method!r}, available: {', '.join(OCR_ENGINES)}")
+        engine_class = OCR_ENGINES[method]
+        if not engine_class.tesseract_options:
+            psm, whitelist = 0, None
+        key = (method, lang, psm, whitelist)
+        with self._lock:
+            if key not in self._engines:
+                self._engines[key] = engine_class(lang, psm, whitelist)
+            return self._engines[key]
+
+    def close(self) -> None:
+        """Release every engine"""
+        with self._lock:
+            for engine in self._engines.values():
+                engine.close()
+            self._engines.clear()
+
+
+engine_pool = EnginePool()
@@ -0,0 +1,84 @@
+import numpy as np
+from PIL import Image
+
+GREY_WEIGHTS = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+MIN_TEXT_CONTRAST = 40  # Crops with a smaller grey level range are blank
+TEXT_PADDING = 8  # White pixels kept around the text, Tesseract reads glyphs touching the border badly
+
+
+def _otsu_threshold(histogram: np.ndarray) -> int:
+    """Find the grey level best separating the text from the background
+
+    :param histogram: The count of pixels of each of the 256 grey levels
+    :return: The threshold
+    """
+    histogram = histogram.astype(np.float64)
+    levels = np.arange(256)
+    weight_below = np.cumsum(histogram)
+    weight_above = weight_below[-1] - weight_below
+    sum_below = np.cumsum(histogram * levels)
+    mean_below = sum_below / np.maximum(weight_below, 1)
+    mean_above = (sum_below[-1] - sum_below) / np.maximum(weight_above, 1)
+    between_variance = weight_below * weight_above * (mean_below - mean_above) ** 2
+    return int(np.argmax(between_variance))
+
+
+def text_threshold(grey: np.ndarray) -> tuple[int, bool] | None:
+    """Find the grey level separating the text from the background, and on which side of it the text is
+
+    The text is the minority side of the Otsu threshold, so light text on a dark background and dark text on a
+    light background both work.
+
+    :param grey: The greyscale pixels, or a subsample of them
+    :return: The threshold and whether the text is above it, or None if the pixels are blank
+    """
+    histogram = np.bincount(grey.ravel(), minlength=256)
+    levels = np.flatnonzero(histogram)
+    if levels[-1] - levels[0] < MIN_TEXT_CONTRAST:
+        return None
+    threshold = _otsu_threshold(histogram)
+    return threshold, int(histogram[threshold + 1:].sum()) * 2 <= grey.size
+
+
+def text_mask(pixels: np.ndarray, stride: int = 1) -> np.ndarray | None:
+    """Separate the text from the background of a crop
+
+    :param pixels: The RGB or greyscale pixels of the crop
+    :param stride: The threshold is computed on every stride-th pixel of every stride-th row, for speed
+    :return: Whether each pixel is text, or None if the crop is blank
+    """
+    grey = pixels if pixels.ndim == 2 else (pixels[..., :3] @ GREY_WEIGHTS).astype(np.uint8)
+    split = text_threshold(grey[::stride, ::stride])
+    if split is None:
+        return None
+    threshold, light_text = split
+    return (grey > threshold) == light_text
+
+
+def text_columns(mask: np.ndarray) -> tuple[int, int] | None:
+    """Find the horizontal extent of the text with a column projection
+
+    :param mask: The text mask
+    :return: The first and past-the-last text columns, or None if there is no text
+    """
+    columns = np.flatnonzero(mask.any(axis=0))
+    if columns.size == 0:
+        return None
+    return int(columns[0]), int(columns[-1]) + 1
+
+
+def preprocess_for_ocr(pixels: np.ndarray) -> Image.Image | None:
+    """Crop a text strip to its text and binarize it, black text on white
+
+    :param pixels: The pixels of the strip
+    :return: The image to read, or None if the strip holds no text
+    """
+    mask = text_mask(pixels)
+    if mask is None:
+        return None
+    extent = text_columns(mask)
+    if extent is None:
+        return None
+    left, right = extent
+    binary = np.where(mask[:, left:right], 0, 255).astype(np.uint8)
+    return Image.fromarray(np.pad(binary, TEXT_PADDING, constant_values=255))
@@ -1,47 +1,159 @@
-import datetime
-import os
+from functools import lru_cache
 
-import win32gui
-from PIL import Image, ImageGrab
+import numpy as np
+from PIL import Image
+
+from config.screenshot import *
+from utils.backends import CaptureBackend, WindowBackend
+from utils.debug_writer import POLICY_DROP, DebugImageWriter
+from utils.timing import timings
+
+REFERENCE_WIDTH = 1920
+REFERENCE_HEIGHT = 1080
+LIST_THUMBNAIL_REDUCE = 8
+DEBUG_ROWS = 5  # Rows of each frame saved in debug mode
+
+
+@lru_cache(maxsize=8)
+def compute_rois(width: int, height: int) -> dict[str, list[tuple[int, int, int, int]]]:
+    """Compute the pixel rectangles of every row region for a frame size
+
+    :param width: The width of the frame
+    :param height: The height of the frame
+    :return: The (left, top, right, bottom) rectangles of the name, desc and completed regions and of the whole
+        row, per row
+    """
+    def rect(x: float, y: float, w: float, h: float) -> tuple[int, int, int, int]:
+        left, top = int(width * x), int(height * y)
+        return left, top, left + int(width * w), top + int(height * h)
+
+    return {
+        "name": [rect(NAME_X, y, NAME_X_END - NAME_X, FONT_HEIGHT) for y in NAME_Y],
+        "desc": [rect(NAME_X, y + DESC_SHIFT_Y, NAME_X_END - NAME_X, FONT_HEIGHT) for y in NAME_Y],
+        "completed": [rect(COMPLETED_X, y, COMPLETED_X_END - COMPLETED_X, FONT_HEIGHT) for y in COMPLETED_Y],
+        "row": [rect(NAME_X, y, COMPLETED_X_END - NAME_X, DESC_SHIFT_Y + FONT_HEIGHT) for y in NAME_Y],
+    }
+
+
+class Frame:
+    """A single capture of the game client area, at the reference resolution"""
+
+    def __init__(self, pixels: np.ndarray) -> None:
+        """Constructor
+
+        :param pixels: The RGB pixels of the capture
+        """
+        self.pixels = pixels
+        self._rois = compute_rois(pixels.shape[1], pixels.shape[0])
+
+    def _region(self, kind: str, index: int) -> np.ndarray:
+        left, top, right, bottom = self._rois[kind][min(index, 4)]
+        return self.pixels[top:bottom, left:right]
+
+    def name(self, index: int) -> np.ndarray:
+        """Get a view of the name region of a row
+
+        :param index: The index of the row
+        :return: The pixels of the region, without copy
+        """
+        return self._region("name", index)
+
+    def desc(self, index: int) -> np.ndarray:
+        """Get a view of the description region of a row
+
+        :param index: The index of the row
+        :return: The pixels of the region, without copy
+        """
+        return self._region("desc", index)
+
+    def completed(self, index: int) -> np.ndarray:
+        """Get a view of the completed status region of a row
+
+        :param index: The index of the row
+        :return: The pixels of the region, without copy
+        """
+        return self._region("completed", index)
+
+    def row(self, index: int) -> np.ndarray:
+        """Get a view of a whole row, from its name to its completed status
+
+        :param index: The index of the row
+        :return: The pixels of the row, without copy
+        """
+        return self._region("row", index)
 
 
 class Screenshot:
     """For taking screenshots of the game window"""
 
-    def __init__(self, hwnd, debug: bool = False, debug_output_location: str = ""):
+    def __init__(self, window: WindowBackend, capture: CaptureBackend, debug: bool = False,
+                 debug_output_location: str = "", debug_policy: str = POLICY_DROP):
         """Constructor
 
-        :param hwnd: The window handle of the game window
+        :param window: The game window
+        :param capture: The screen capture backend
         :param debug: Whether to save screenshots, default False
         :param debug_output_location: Output location of saved screenshots
+        :param debug_policy: What to do with screenshots when the debug writer falls behind, dropped by default
         """
-        self._window_width, self._window_height = win32gui.GetClientRect(hwnd)[2:]
-        self._window_x, self._window_y = win32gui.ClientToScreen(hwnd, (0, 0))
+        self._capture = capture
+        self._window_width, self._window_height = window.client_size()
+        self._window_x, self._window_y = window.client_origin()
 
-        self._x_scaling_factor = self._window_width / 1920
-        self._y_scaling_factor = self._window_height / 1080
+        self._list_bbox = (
+            self._window_x + int(self._window_width * NAME_X),
+            self._window_y + int(self._window_height * NAME_Y[0]),
+            self._window_x + int(self._window_width * COMPLETED_X_END),
+            self._window_y + int(self._window_height * (NAME_Y[4] + DESC_SHIFT_Y + FONT_HEIGHT)),
+        )
 
-        self._debug = debug
-        self._debug_output_location = debug_output_location
+        self._debug_writer = DebugImageWriter(debug_output_location, debug_policy) if debug else None
 
-    def take_screenshot(self, x: float, y: float, width: float, height: float) -> Image:
-        x = self._window_x + int(self._window_width * x)
-        y = self._window_y + int(self._window_height * y)
-        width = int(self._window_width * width)
-        height = int(self._window_height * height)
-        screenshot = ImageGrab.grab(bbox=(x, y, x + width, y + height), all_screens=True)
-        screenshot = screenshot.resize((int(width / self._x_scaling_factor), int(height / self._y_scaling_factor)))
+    def grab_list_thumbnail(self) -> np.ndarray:
+        """Capture a downscaled greyscale thumbnail of the achievement list, to detect when it stops moving
+
+        :return: The thumbnail pixels
+        """
+        screenshot = self._capture.grab(self._list_bbox)
+        return np.asarray(screenshot.convert("L").reduce(LIST_THUMBNAIL_REDUCE), dtype=np.int16)
+
+    def capture_frame(self) -> Frame:
+        """Capture the whole client area once, resized to the reference resolution
+
+        :return: The captured frame
+        """
+        with timings.span("screenshot.grab"):
+            screenshot = self._capture.grab(
+                (
+                    self._window_x,
+                    self._window_y,
+                    self._window_x + self._window_width,
+                    self._window_y + self._window_height,
+                )
+            )
+        with timings.span("screenshot.resize"):
+            if screenshot.size != (REFERENCE_WIDTH, REFERENCE_HEIGHT):
+                # Box filtering is the cheapest anti-aliased downscale, the text is binarized before OCR anyway
+                if screenshot.width > REFERENCE_WIDTH:
+                    resample = Image.Resampling.BOX
+                else:
+                    resample = Image.Resampling.BICUBIC
+                screenshot = screenshot.resize((REFERENCE_WIDTH, REFERENCE_HEIGHT), resample)
+            frame = Frame(np.asarray(screenshot.convert("RGB")))
 
-        if self._debug:
-            self._save_image(screenshot)
+        if self._debug_writer is not None:
+            # Only the rows are saved, a whole frame takes megabytes as PNG
+            for index in range(DEBUG_ROWS):
+                self._debug_writer.save(Image.fromarray(frame.row(index)))
 
-        return screenshot
+        return frame
 
-    def _save_image(self, img: Image) -> None:
-        """Save the image on disk.
+    def close(self) -> int:
+        """Finish writing the debug screenshots
 
-        :param img: The image to save.
+        :return: The number of debug screenshots dropped because the writer fell behind
         """
-        file_name = f"{datetime.datetime.now().strftime('%H%M%S%f')}.png"
-        output_location = os.path.join(self._debug_output_location, file_name)
-        img.save(output_location)
\ No newline at end of file
+        if self._debug_writer is None:
+            return 0
+        self._debug_writer.close()
+        return self._debug_writer.dropped
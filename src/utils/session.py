@@ -0,0 +1,242 @@
+import hashlib
+import io
+import json
+import zipfile
+
+from PIL import Image
+
+from utils.backends import Backends, CaptureBackend, Clock, InputBackend, WindowBackend
+
+SESSION_FORMAT = 1
+
+
+class SessionRecorder:
+    """Records every capture and input of a scan into a session archive
+
+    The archive is a zip file holding the captures as PNG and a session.json listing the events in order.
+    A capture identical to the previous one of the same region is stored once.
+    """
+
+    def __init__(self, path: str, backends: Backends) -> None:
+        """Constructor
+
+        :param path: The archive to write
+        :param backends: The backends to record
+        """
+        self._archive = zipfile.ZipFile(path, "w", zipfile.ZIP_STORED)
+        self._events: list[dict] = []
+        self._last_frames: dict[tuple, tuple[bytes, str]] = {}
+        self._inner = backends
+        self.backends = Backends(
+            _RecordingWindow(backends.window, self),
+            _RecordingCapture(backends.capture, self),
+            _RecordingInput(backends.gamepad, self),
+            backends.clock,
+        )
+        self.backends.close = self.close
+
+    def record_frame(self, bbox: tuple[int, int, int, int], img: Image.Image) -> None:
+        """Record a capture
+
+        :param bbox: The captured region
+        :param img: The captured image
+        """
+        bbox = tuple(bbox)
+        digest = hashlib.blake2b(img.tobytes(), digest_size=16).digest()
+        last = self._last_frames.get(bbox)
+        if last is not None and last[0] == digest:
+            file_name = last[1]
+        else:
+            file_name = f"frames/{len(self._events):06d}.png"
+            buffer = io.BytesIO()
+            img.save(buffer, format="PNG", compress_level=1)
+            self._archive.writestr(file_name, buffer.getvalue())
+            self._last_frames[bbox] = (digest, file_name)
+        self._events.append({"type": "grab", "bbox": list(bbox), "file": file_name})
+
+    def record_event(self, event_type: str, **values) -> None:
+        """Record a window or input event
+
+        :param event_type: The event type
+        """
+        self._events.append({"type": event_type, **values})
+
+    def close(self) -> None:
+        """Write the event list and close the archive"""
+        if self._archive.fp is None:
+            return
+        self._archive.writestr("session.json", json.dumps({"format": SESSION_FORMAT, "events": self._events}))
+        self._archive.close()
+        self._inner.close()
+
+
+class _RecordingWindow(WindowBackend):
+    def __init__(self, inner: WindowBackend, recorder: SessionRecorder) -> None:
+        self._inner = inner
+        self._recorder = recorder
+
+    def find_game(self) -> bool:
+        is_en = self._inner.find_game()
+        self._recorder.record_event("window", is_en=is_en)
+        return is_en
+
+    def client_size(self) -> tuple[int, int]:
+        size = self._inner.client_size()
+        self._recorder.record_event("client_size", size=list(size))
+        return size
+
+    def client_origin(self) -> tuple[int, int]:
+        origin = self._inner.client_origin()
+        self._recorder.record_event("client_origin", origin=list(origin))
+        return origin
+
+    def bring_to_foreground(self, cmd_show: int = 5) -> None:
+        self._inner.bring_to_foreground(cmd_show)
+
+    def is_foreground(self) -> bool:
+        return self._inner.is_foreground()
+
+
+class _RecordingCapture(CaptureBackend):
+    def __init__(self, inner: CaptureBackend, recorder: SessionRecorder) -> None:
+        self._inner = inner
+        self._recorder = recorder
+
+    def grab(self, bbox: tuple[int, int, int, int]) -> Image.Image:
+        img = self._inner.grab(bbox)
+        self._recorder.record_frame(bbox, img)
+        return img
+
+
+class _RecordingInput(InputBackend):
+    def __init__(self, inner: InputBackend, recorder: SessionRecorder) -> None:
+        self._inner = inner
+        self._recorder = recorder
+        self.realtime = inner.realtime
+
+    def press(self, button: str) -> None:
+        self._inner.press(button)
+        self._recorder.record_event("press", button=button)
+
+    def release(self, button: str) -> None:
+        self._inner.release(button)
+        self._recorder.record_event("release", button=button)
+
+
+class ReplaySession:
+    """Replays a session archive, so a scan can run without the game
+
+    Captures are grouped by the input that preceded them. After an input, each captured region returns the frames
+    recorded for it after that same input, in order, then keeps returning the last one. The number of polls of the
+    settle detection can then differ from the recording without desynchronizing the replay. The settle detection
+    waits on a clock that only advances when it sleeps, so a replay runs at full speed and polls as many times on
+    every run.
+    """
+
+    def __init__(self, path: str) -> None:
+        """Constructor
+
+        :param path: The archive to replay
+        :raises ValueError: Thrown if the archive is not a session
+        """
+        self._archive = zipfile.ZipFile(path)
+        session = json.loads(self._archive.read("session.json"))
+        if session.get("format") != SESSION_FORMAT:
+            raise ValueError(f"Unsupported session format {session.get('format')}")
+        events = session["events"]
+
+        self.is_en = next((e["is_en"] for e in events if e["type"] == "window"), True)
+        self.size = tuple(next(e["size"] for e in events if e["type"] == "client_size"))
+        self.origin = tuple(next((e["origin"] for e in events if e["type"] == "client_origin"), (0, 0)))
+
+        # Frames per input segment, per region
+        self._segments: list[dict[tuple, list[str]]] = [{}]
+        for event in events:
+            if event["type"] == "press":
+                self._segments.append({})
+            elif event["type"] == "grab":
+                self._segments[-1].setdefault(tuple(event["bbox"]), []).append(event["file"])
+        self._segment = 0
+        self._cursors: dict[tuple, int] = {}
+        self._last: dict[tuple, tuple[str, Image.Image]] = {}
+
+        self.backends = Backends(_ReplayWindow(self), _ReplayCapture(self), _ReplayInput(self), _ReplayClock())
+        self.backends.close = self._archive.close
+
+    def next_input(self) -> None:
+        """Move on to the frames captured after the next input"""
+        self._segment = min(self._segment + 1, len(self._segments) - 1)
+        self._cursors.clear()
+
+    def frame(self, bbox: tuple[int, int, int, int]) -> Image.Image:
+        """Get the next frame of a region
+
+        :param bbox: The captured region
+        :raises ValueError: Thrown if the region was never captured up to this point of the session
+        :return: The frame
+        """
+        bbox = tuple(bbox)
+        files = self._segments[self._segment].get(bbox, [])
+        cursor = self._cursors.get(bbox, 0)
+        if cursor < len(files):
+            self._cursors[bbox] = cursor + 1
+            if bbox not in self._last or self._last[bbox][0] != files[cursor]:
+                with self._archive.open(files[cursor]) as frame_file:
+                    img = Image.open(io.BytesIO(frame_file.read()))
+                    img.load()
+                self._last[bbox] = (files[cursor], img)
+        if bbox not in self._last:
+            raise ValueError(f"No frame recorded for region {bbox}")
+        return self._last[bbox][1]
+
+
+class _ReplayWindow(WindowBackend):
+    def __init__(self, session: ReplaySession) -> None:
+        self._session = session
+
+    def find_game(self) -> bool:
+        return self._session.is_en
+
+    def client_size(self) -> tuple[int, int]:
+        return self._session.size
+
+    def client_origin(self) -> tuple[int, int]:
+        return self._session.origin
+
+    def bring_to_foreground(self, cmd_show: int = 5) -> None:
+        pass
+
+    def is_foreground(self) -> bool:
+        return True
+
+
+class _ReplayCapture(CaptureBackend):
+    def __init__(self, session: ReplaySession) -> None:
+        self._session = session
+
+    def grab(self, bbox: tuple[int, int, int, int]) -> Image.Image:
+        return self._session.frame(bbox)
+
+
+class _ReplayClock(Clock):
+    def __init__(self) -> None:
+        self._now = 0.
+
+    def now(self) -> float:
+        return self._now
+
+    def sleep(self, seconds: float) -> None:
+        self._now += seconds
+
+
+class _ReplayInput(InputBackend):
+    realtime = False
+
+    def __init__(self, session: ReplaySession) -> None:
+        self._session = session
+
+    def press(self, button: str) -> None:
+        self._session.next_input()
+
+    def release(self, button: str) -> None:
+        pass
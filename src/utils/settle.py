@@ -0,0 +1,96 @@
+from typing import Callable
+
+import numpy as np
+
+from utils.backends import Clock
+
+
+class SettleDetector:
+    """Waits for the screen to stop changing after an input, instead of sleeping for a fixed time"""
+
+    POLL_INTERVAL = 0.02
+    CHANGE_GRACE = 0.4  # The screen may not react at all, e.g. going down at the bottom of a list
+    STABLE_POLLS = 2
+    THRESHOLD = 1.0  # Mean absolute difference of the thumbnails, in grey levels
+
+    def __init__(self, grab: Callable[[], np.ndarray], clock: Clock | None = None) -> None:
+        """Constructor
+
+        :param grab: Captures a cheap thumbnail of the region to watch
+        :param clock: The clock to wait with, the real time by default
+        """
+        self._grab = grab
+        self._clock = clock or Clock()
+        self._reference: np.ndarray | None = None
+        self._last_reference: np.ndarray | None = None  # Reference of the last input waited for
+        self.latencies: dict[str, list[float]] = {}
+        self.moved: bool | None = None  # Whether the screen changed after the last input, None if unknown
+
+    def _differs(self, a: np.ndarray, b: np.ndarray) -> bool:
+        return a.shape != b.shape or float(np.mean(np.abs(a - b))) > self.THRESHOLD
+
+    def mark(self) -> None:
+        """Capture the reference thumbnail, right before sending an input"""
+        self._reference = self._grab()
+
+    def wait(self, kind: str, timeout: float, minimum: float = 0.) -> float:
+        """Wait until consecutive thumbnails stop changing
+
+        :param kind: The kind of input waited for, used to group the recorded latencies
+        :param timeout: The maximum time to wait, in seconds
+        :param minimum: The minimum time to wait, in seconds
+        :return: The time waited, in seconds
+        """
+        start = self._clock.now()
+        if minimum > 0:
+            self._clock.sleep(minimum)
+        changed = self._reference is None
+        self.moved = None if changed else False
+        previous = self._grab()
+        if not changed and self._differs(previous, self._reference):
+            changed = self.moved = True
+        stable = 0
+        while self._clock.now() - start < timeout:
+            self._clock.sleep(self.POLL_INTERVAL)
+            current = self._grab()
+            if not changed:
+                changed = self._differs(current, self._reference)
+                if changed:
+                    self.moved = True
+                elif self._clock.now() - start < self.CHANGE_GRACE:
+                    previous = current
+                    continue
+                changed = True
+            if not self.moved and self._reference is not None and self._differs(current, self._reference):
+                self.moved = True
+            stable = 0 if self._differs(current, previous) else stable + 1
+            if stable >= self.STABLE_POLLS:
+                break
+            previous = current
+        self._last_reference, self._reference = self._reference, None
+        elapsed = self._clock.now() - start
+        self.latencies.setdefault(kind, []).append(elapsed)
+        return elapsed
+
+    def changed_late(self, delay: float) -> bool:
+        """Check again whether the screen changed after the last input, for a game reacting after CHANGE_GRACE
+
+        :param delay: The time to wait before checking, in seconds
+        :return: Whether the screen changed after the last input
+        """
+        if self._last_reference is None:
+            return bool(self.moved)
+        self._clock.sleep(delay)
+        if not self.moved and self._differs(self._grab(), self._last_reference):
+            self.moved = True
+        return bool(self.moved)
+
+    def summary(self) -> str:
+        """Summarize the recorded latencies
+
+        :return: The mean and max latency per kind of input
+        """
+        return ", ".join(
+            f"{kind}: mean {np.mean(values) * 1000:.0f}ms, max {np.max(values) * 1000:.0f}ms ({len(values)})"
+            for kind, values in self.latencies.items()
+        )
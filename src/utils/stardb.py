@@ -0,0 +1,97 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils.data import STARDB_CHIVE_API_URL
+
+STARDB_COOKIE = "id"
+STARDB_TIMEOUT = 10
+STARDB_BATCH_SIZE = 100
+STARDB_WORKERS = 4
+STARDB_RETRIES = 5
+STARDB_BACKOFF = 0.5  # Seconds before the first retry, doubled after each one
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class StarDBClient:
+    """Uploads the completed achievements to stardb.gg, sending only the ones it does not know yet
+
+    Achievements are never removed from the remote state, as a scan might have missed some.
+    """
+
+    def __init__(self, cookie: str, url: str = STARDB_CHIVE_API_URL, batch_size: int = STARDB_BATCH_SIZE,
+                 workers: int = STARDB_WORKERS, retries: int = STARDB_RETRIES,
+                 backoff: float = STARDB_BACKOFF) -> None:
+        """Constructor
+
+        :param cookie: The value of the stardb.gg id cookie
+        :param url: The achievements endpoint of the logged in user
+        :param batch_size: The maximum number of achievements per request
+        :param workers: The maximum number of requests in flight
+        :param retries: The number of retries of a request rejected with 429 or 5xx
+        :param backoff: The delay before the first retry, in seconds
+        """
+        self._url = url.rstrip("/")
+        self._batch_size = batch_size
+        self._workers = workers
+        self._retries = retries
+        self._backoff = backoff
+        self._session = requests.Session()
+        self._session.mount(self._url, HTTPAdapter(pool_connections=1, pool_maxsize=workers))
+        self._session.cookies.set(STARDB_COOKIE, cookie)
+
+    def __enter__(self) -> "StarDBClient":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Close the pooled connections"""
+        self._session.close()
+
+    def _request(self, method: str, **kwargs) -> requests.Response:
+        """Send a request, retrying with exponential backoff while the server is overloaded
+
+        :param method: The HTTP method
+        :raises requests.exceptions.HTTPError: Thrown if the request still fails after the retries
+        :return: The response
+        """
+        delay = self._backoff
+        for attempt in range(self._retries + 1):
+            response = self._session.request(method, self._url, timeout=STARDB_TIMEOUT, **kwargs)
+            if response.status_code not in RETRY_STATUSES or attempt == self._retries:
+                break
+            retry_after = response.headers.get("Retry-After", "")
+            time.sleep(float(retry_after) if retry_after.isdigit() else delay)
+            delay *= 2
+        response.raise_for_status()
+        return response
+
+    def fetch_completed(self) -> set[int]:
+        """Get the achievements already completed on stardb.gg, which lists their IDs
+
+        :raises ValueError: Thrown if the response is not a list of achievement IDs
+        :return: The IDs of the completed achievements
+        """
+        remote = self._request("GET").json()
+        if not isinstance(remote, list) or not all(type(chive_id) is int for chive_id in remote):
+            raise ValueError("stardb.gg did not answer with a list of achievement IDs")
+        return set(remote)
+
+    def upload(self, completed: list[int]) -> list[int]:
+        """Upload the achievements missing from the remote state
+
+        :param completed: The IDs of the completed achievements
+        :raises requests.exceptions.RequestException: Thrown if a batch could not be uploaded
+        :raises ValueError: Thrown if the remote state could not be read
+        :return: The IDs of the uploaded achievements
+        """
+        missing = sorted(set(completed) - self.fetch_completed())
+        batches = [missing[i:i + self._batch_size] for i in range(0, len(missing), self._batch_size)]
+        with ThreadPoolExecutor(max_workers=self._workers) as executor:
+            for _ in executor.map(lambda batch: self._request("PUT", json=batch), batches):
+                pass
+        return missing
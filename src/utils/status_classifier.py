@@ -0,0 +1,88 @@
+import numpy as np
+
+from config.screenshot import CLAIM_BOX_SHIFT_AFTER_RESIZE
+from utils.screenshot import Frame
+
+CLAIMABLE = "claimable"
+COMPLETED = "completed"
+UNCOMPLETED = "uncompleted"
+
+CLAIM_COLOR = np.array([0xFF, 0xC7, 0x59], dtype=np.float32)
+PAGE_ROWS = 5
+
+
+class StatusClassifier:
+    """Classifies the status of every visible row from the pixels of the COMPLETED_X region
+
+    Claimable rows are found with the color of the claim box. Completed and uncompleted rows are found by
+    correlation with templates, learned from the rows whose status was read with OCR. Rows that are not
+    a clear match are left to the OCR.
+    """
+
+    MIN_CORRELATION = 0.9
+    MIN_MARGIN = 0.1
+    MAX_CLAIM_COLOR_DISTANCE = 5  # Arbitrary value, can induce bugs ?
+
+    def __init__(self) -> None:
+        self._templates: dict[str, np.ndarray] = {}
+        self._template_counts: dict[str, int] = {}
+
+    @staticmethod
+    def _normalize(crops: np.ndarray) -> np.ndarray:
+        """Flatten greyscale crops to zero-mean unit-norm vectors, so their dot product is their correlation
+
+        :param crops: The crops, of shape (n, height, width, 3)
+        :return: The vectors, of shape (n, height * width)
+        """
+        grey = crops.mean(axis=3).reshape(len(crops), -1)
+        grey -= grey.mean(axis=1, keepdims=True)
+        norms = np.linalg.norm(grey, axis=1, keepdims=True)
+        return grey / np.maximum(norms, 1e-6)
+
+    def classify_page(self, frame: Frame, rows: list[int] | None = None) -> list[tuple[str | None, float]]:
+        """Classify the status of visible rows of a frame, all of them in one call
+
+        :param frame: The frame to classify
+        :param rows: The indexes of the rows, as given to Frame.completed, every visible row if None
+        :return: The status and confidence of each row, the status is None when unsure
+        """
+        rows = list(range(PAGE_ROWS)) if rows is None else rows
+        crops = np.stack([frame.completed(i) for i in rows]).astype(np.float32)
+        x, y, z, t = CLAIM_BOX_SHIFT_AFTER_RESIZE
+        claim_distances = np.linalg.norm(crops[:, y:t, x:z, :].mean(axis=(1, 2)) - CLAIM_COLOR, axis=1)
+
+        correlations: dict[str, np.ndarray] = {}
+        if self._templates:
+            vectors = self._normalize(crops)
+            for status, template in self._templates.items():
+                correlations[status] = vectors @ template
+
+        results: list[tuple[str | None, float]] = []
+        for row in range(len(rows)):
+            if claim_distances[row] < self.MAX_CLAIM_COLOR_DISTANCE:
+                results.append((CLAIMABLE, 1.))
+                continue
+            completed = correlations.get(COMPLETED, np.zeros(len(rows)))[row]
+            uncompleted = correlations.get(UNCOMPLETED, np.zeros(len(rows)))[row]
+            if completed >= self.MIN_CORRELATION and completed - uncompleted >= self.MIN_MARGIN:
+                results.append((COMPLETED, float(completed)))
+            elif uncompleted >= self.MIN_CORRELATION and uncompleted - completed >= self.MIN_MARGIN:
+                results.append((UNCOMPLETED, float(uncompleted)))
+            else:
+                results.append((None, float(max(completed, uncompleted))))
+        return results
+
+    def learn(self, crop: np.ndarray, status: str) -> None:
+        """Add a crop whose status was read with OCR to the template of that status
+
+        :param crop: The COMPLETED_X region of the row
+        :param status: COMPLETED or UNCOMPLETED
+        """
+        vector = self._normalize(crop[np.newaxis].astype(np.float32))[0]
+        count = self._template_counts.get(status, 0)
+        if count == 0:
+            template = vector
+        else:
+            template = (self._templates[status] * count + vector) / (count + 1)
+        self._templates[status] = template / max(float(np.linalg.norm(template)), 1e-6)
+        self._template_counts[status] = count + 1
@@ -0,0 +1,99 @@
+import time
+from contextlib import nullcontext
+
+import numpy as np
+
+_NULL_SPAN = nullcontext()
+
+
+class _Span:
+    __slots__ = ("_timings", "_name", "_start")
+
+    def __init__(self, timings: "Timings", name: str) -> None:
+        self._timings = timings
+        self._name = name
+
+    def __enter__(self) -> None:
+        self._start = time.perf_counter()
+
+    def __exit__(self, *exc) -> None:
+        self._timings.record(self._name, time.perf_counter() - self._start)
+
+
+class Timings:
+    """Collects the duration of the scan stages, does nothing until enabled"""
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self._spans: dict[str, list[float]] = {}
+
+    def span(self, name: str):
+        """Time a block of code
+
+        :param name: The stage name
+        :return: A context manager timing the block
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def record(self, name: str, seconds: float) -> None:
+        """Record the duration of a stage
+
+        :param name: The stage name
+        :param seconds: The duration
+        """
+        if self.enabled:
+            self._spans.setdefault(name, []).append(seconds)
+
+    def merge(self, spans: dict[str, list[float]]) -> None:
+        """Add durations recorded in another process
+
+        :param spans: The durations per stage
+        """
+        for name, durations in spans.items():
+            self._spans.setdefault(name, []).extend(durations)
+
+    def drain(self) -> dict[str, list[float]]:
+        """Get the recorded durations and forget them
+
+        :return: The durations per stage
+        """
+        spans, self._spans = self._spans, {}
+        return spans
+
+    def reset(self, enabled: bool) -> None:
+        """Forget the recorded durations
+
+        :param enabled: Whether to record the next ones
+        """
+        self.enabled = enabled
+        self._spans = {}
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """Summarize the recorded durations
+
+        :return: The count, p50, p95 and total per stage, in milliseconds
+        """
+        summary = {}
+        for name, durations in sorted(self._spans.items()):
+            values = np.array(durations) * 1000
+            summary[name] = {
+                "count": len(values),
+                "p50_ms": round(float(np.percentile(values, 50)), 3),
+                "p95_ms": round(float(np.percentile(values, 95)), 3),
+                "total_ms": round(float(values.sum()), 3),
+            }
+        return summary
+
+    def report(self) -> str:
+        """:return: The summary as text, slowest stages first"""
+        summary = self.summary()
+        return "\n".join(
+            f"{name}: total {stats['total_ms'] / 1000:.2f}s, p50 {stats['p50_ms']:.1f}ms, "
+            f"p95 {stats['p95_ms']:.1f}ms ({stats['count']})"
+            for name, stats in sorted(summary.items(), key=lambda item: -item[1]["total_ms"])
+        )
+
+
+timings = Timings()
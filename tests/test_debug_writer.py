@@ -0,0 +1,28 @@
+import zipfile
+
+import pytest
+from PIL import Image
+
+from utils.debug_writer import DEBUG_ARCHIVE_FILE, POLICY_BLOCK, DebugImageWriter
+
+
+def test_images_are_written_to_the_archive(tmp_path):
+    writer = DebugImageWriter(str(tmp_path), POLICY_BLOCK, queue_size=1)
+    for _ in range(3):
+        writer.save(Image.new("RGB", (8, 8)))
+    writer.close()
+
+    assert writer.written == 3
+    assert len(zipfile.ZipFile(tmp_path / DEBUG_ARCHIVE_FILE).namelist()) == 3
+
+
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_blocking_save_does_not_wait_for_a_stopped_writer(tmp_path):
+    # The archive can't be created in a missing folder, so the writer thread stops right away
+    writer = DebugImageWriter(str(tmp_path / "missing"), POLICY_BLOCK, queue_size=1)
+    for _ in range(3):
+        writer.save(Image.new("RGB", (8, 8)))
+    writer.close()
+
+    assert writer.written == 0
+    assert writer.dropped >= 2
@@ -0,0 +1,46 @@
+from logic.game_data import GameData
+
+UNRELATED_TITLES = [
+    "Trailblazing Express", "Jarilo Winter", "Herta Space Station", "Xianzhou Luofu",
+    "Golden Hour Penacony", "Memory of Chaos", "Forgotten Hall",
+]
+
+
+def _game_data(titles: list[str], series_count: int = 9) -> GameData:
+    """Game data with the titles in series 1, and an achievement in each other series"""
+    data = {
+        str(c_id): {"title": title, "desc": f"Description of {title}", "series": 1}
+        for c_id, title in enumerate(titles, start=1)
+    }
+    for series in range(2, series_count + 1):
+        data[str(100 * series)] = {"title": f"Series {series}", "desc": "", "series": series}
+    return GameData(data)
+
+
+def test_prediction_loses_to_a_better_title_outside_the_window():
+    game_data = _game_data(["First Row", "Sample Title I", *UNRELATED_TITLES, "Sample Title II"])
+    predicted = game_data.predicted_ids(1, 1)
+    assert predicted == list(range(2, 10))
+
+    assert game_data.closest_title("Sample Title II", predicted=predicted, tab=1) == (1.0, "Sample Title II", 10)
+
+
+def test_prediction_is_kept_when_it_is_the_best_title():
+    game_data = _game_data(["First Row", "Sample Title I", *UNRELATED_TITLES, "Sample Title II"])
+    predicted = game_data.predicted_ids(1, 1)
+
+    assert game_data.closest_title("Sample Title I", predicted=predicted, tab=1) == (1.0, "Sample Title I", 2)
+
+
+def test_tabs_follow_the_series_of_the_menu():
+    game_data = _game_data(["First Row", "Sample Title I"])
+
+    assert game_data.tabs[1] == [1, 2]
+    assert game_data.tabs[9] == [900]
+
+
+def test_unknown_series_disable_tabs():
+    game_data = _game_data(["First Row", "Sample Title I"], series_count=10)
+
+    assert game_data.tabs == {}
+    assert game_data.closest_title("Sample Title I", tab=1) == (1.0, "Sample Title I", 2)
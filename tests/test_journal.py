@@ -0,0 +1,49 @@
+import json
+import time
+
+from utils.journal import ScanJournal, load_journal
+
+
+def _write_journal(path: str, version: str) -> None:
+    journal = ScanJournal(path, version=version)
+    journal.record(101, 1, 0, "digest")
+    journal.end_tab(1)
+    journal.record(201, 2, 0, "digest")
+    journal.close()
+
+
+def test_unfinished_scan_is_resumed(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    _write_journal(path, "v1")
+
+    start_tab, entries = load_journal(path, "v1")
+
+    assert start_tab == 2
+    assert [entry["id"] for entry in entries] == [101, 201]
+
+
+def test_journal_of_other_game_data_is_not_resumed(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    _write_journal(path, "v1")
+
+    assert load_journal(path, "v2") is None
+
+
+def test_old_journal_is_not_resumed(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    _write_journal(path, "v1")
+    with open(path, encoding="utf-8") as journal_file:
+        lines = journal_file.readlines()
+    lines[0] = json.dumps({"version": "v1", "started": time.time() - 2 * 24 * 60 * 60}) + "\n"
+    with open(path, "w", encoding="utf-8") as journal_file:
+        journal_file.writelines(lines)
+
+    assert load_journal(path, "v1") is None
+
+
+def test_journal_without_header_is_not_resumed(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    with open(path, "w", encoding="utf-8") as journal_file:
+        journal_file.write(json.dumps({"id": 101, "tab": 1, "index": 0, "hash": ""}) + "\n")
+
+    assert load_journal(path, "v1") is None
@@ -0,0 +1,49 @@
+import numpy as np
+
+from utils.backends import Clock
+from utils.settle import SettleDetector
+
+
+class _SteppedClock(Clock):
+    def __init__(self) -> None:
+        self.time = 0.
+
+    def now(self) -> float:
+        return self.time
+
+    def sleep(self, seconds: float) -> None:
+        self.time += seconds
+
+
+def _thumbnails(values: list[int]):
+    thumbnails = iter(values)
+    last = [values[-1]]
+
+    def grab() -> np.ndarray:
+        last[0] = next(thumbnails, last[0])
+        return np.full((4, 4), last[0], dtype=np.int16)
+
+    return grab
+
+
+def test_wait_ends_once_the_screen_is_stable():
+    clock = _SteppedClock()
+    settle = SettleDetector(_thumbnails([0, 0, 50, 100, 100, 100]), clock)
+    settle.mark()
+
+    elapsed = settle.wait("go_down", timeout=1.)
+
+    assert settle.moved
+    assert elapsed == clock.time
+    assert elapsed < settle.CHANGE_GRACE
+
+
+def test_screen_that_never_moves_is_waited_for_the_grace_period():
+    clock = _SteppedClock()
+    settle = SettleDetector(_thumbnails([0]), clock)
+    settle.mark()
+
+    elapsed = settle.wait("go_down", timeout=1.)
+
+    assert settle.moved is False
+    assert settle.CHANGE_GRACE <= elapsed < 1.
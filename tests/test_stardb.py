@@ -0,0 +1,78 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from utils.stardb import StarDBClient
+
+
+class _StarDBStandIn(BaseHTTPRequestHandler):
+    """Stand-in of the stardb.gg achievements endpoint: GET lists the completed IDs, PUT adds a list of IDs"""
+
+    protocol_version = "HTTP/1.1"
+    state: dict = {}
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _send(self, code: int, body: bytes = b"", headers: tuple = ()) -> None:
+        self.send_response(code)
+        for key, value in headers:
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        self.state["cookies"].add(self.headers.get("Cookie"))
+        self._send(200, json.dumps(self.state.get("listing", sorted(self.state["completed"]))).encode())
+
+    def do_PUT(self) -> None:
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if self.state["failures"] > 0:
+            self.state["failures"] -= 1
+            return self._send(429, headers=[("Retry-After", "0")])
+        self.state["batches"].append(body)
+        self.state["completed"] |= set(body)
+        self._send(200)
+
+
+@pytest.fixture
+def stardb():
+    _StarDBStandIn.state = {"completed": {1, 2}, "batches": [], "failures": 0, "cookies": set()}
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StarDBStandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/api/users/me/achievements/", _StarDBStandIn.state
+    server.shutdown()
+    server.server_close()
+
+
+def test_only_missing_achievements_are_uploaded(stardb):
+    url, state = stardb
+    with StarDBClient("cookie", url, batch_size=10, backoff=0) as client:
+        uploaded = client.upload(list(range(1, 36)))
+
+    assert uploaded == list(range(3, 36))
+    assert sorted(len(batch) for batch in state["batches"]) == [3, 10, 10, 10]
+    assert state["completed"] == set(range(1, 36))
+    assert state["cookies"] == {"id=cookie"}
+
+
+def test_rejected_batches_are_retried(stardb):
+    url, state = stardb
+    state["failures"] = 2
+    with StarDBClient("cookie", url, backoff=0) as client:
+        client.upload([1, 2, 3])
+
+    assert state["batches"] == [[3]]
+
+
+def test_unknown_response_format_is_an_error(stardb):
+    url, state = stardb
+    state["listing"] = {"achievements": [{"id": 1}]}
+    with StarDBClient("cookie", url) as client:
+        with pytest.raises(ValueError):
+            client.upload([1, 2, 3])
+
+    assert state["batches"] == []